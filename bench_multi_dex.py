@@ -0,0 +1,451 @@
+"""
+Offline benchmarks for the multi-DEX price tracker
+No network access - runs against synthetic pool data
+"""
+
+import asyncio
+import json
+import math
+import random
+import statistics
+import string
+import time
+import tracemalloc
+from urllib.parse import parse_qs, urlparse
+
+import multi_dex_prices as mdp
+from multi_dex_prices import MultiDEXPriceTracker, PoolData, PoolTable, iter_json_array
+from price_matrix import PriceMatrix, confidence_kernel, robust_outlier_mask
+
+
+def random_mint(rng: random.Random) -> str:
+    return ''.join(rng.choices(string.ascii_letters + string.digits, k=44))
+
+
+def make_tokens(count: int, rng: random.Random) -> dict:
+    tokens = {f"TOK{i}": random_mint(rng) for i in range(count)}
+    tokens['USDC'] = mdp.USDC_MINT
+    return tokens
+
+
+def make_whirlpools(count: int, tokens: dict, rng: random.Random) -> list:
+    """Synthetic Orca whirlpool list: ~10% of pools pair a tracked token with USDC"""
+    tracked = [mint for mint in tokens.values() if mint != mdp.USDC_MINT]
+    pools = []
+    for i in range(count):
+        roll = rng.random()
+        if roll < 0.05:
+            mint_a, mint_b = rng.choice(tracked), mdp.USDC_MINT
+        elif roll < 0.10:
+            mint_a, mint_b = mdp.USDC_MINT, rng.choice(tracked)
+        else:
+            mint_a, mint_b = random_mint(rng), random_mint(rng)
+        pools.append({
+            'address': f"pool{i}",
+            'tokenA': {'mint': mint_a},
+            'tokenB': {'mint': mint_b},
+            'price': rng.uniform(0.01, 100),
+            'tvl': rng.uniform(0, 200_000),
+            'volume': {'day': rng.uniform(0, 1_000_000)},
+        })
+    return pools
+
+
+def legacy_scan_orca(whirlpools: list, tokens: dict) -> dict:
+    """The original O(pools x tokens) scan, kept here for comparison"""
+    prices = {}
+    for pool in whirlpools:
+        token_a = pool.get('tokenA', {}).get('mint')
+        token_b = pool.get('tokenB', {}).get('mint')
+        tvl = float(pool.get('tvl', 0))
+        volume = float(pool.get('volume', {}).get('day', 0))
+        if tvl < mdp.MIN_LIQUIDITY_USD:
+            continue
+        for symbol, mint in tokens.items():
+            if mint == token_a and token_b == mdp.USDC_MINT:
+                price = float(pool.get('price', 0))
+                if price > 0 and (symbol not in prices or tvl > prices[symbol][1]):
+                    prices[symbol] = (price, tvl, volume)
+            elif mint == token_b and token_a == mdp.USDC_MINT:
+                price = 1.0 / float(pool.get('price', 1))
+                if price > 0 and (symbol not in prices or tvl > prices[symbol][1]):
+                    prices[symbol] = (price, tvl, volume)
+    return prices
+
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - start
+
+
+def bench_pool_scan(pool_count: int = 50_000, token_count: int = 1_000):
+    print(f"Pool scan: {pool_count:,} whirlpools x {token_count:,} tracked tokens")
+    rng = random.Random(42)
+    tokens = make_tokens(token_count, rng)
+    whirlpools = make_whirlpools(pool_count, tokens, rng)
+
+    tracker = MultiDEXPriceTracker(tokens=tokens)
+
+    indexed, indexed_s = timed(tracker.parse_orca_pools, whirlpools)
+    legacy, legacy_s = timed(legacy_scan_orca, whirlpools, tokens)
+
+    assert indexed == legacy, "indexed scan disagrees with legacy scan"
+    print(f"  legacy nested loop : {legacy_s * 1000:10.1f} ms")
+    print(f"  mint->symbol index : {indexed_s * 1000:10.1f} ms  ({legacy_s / indexed_s:,.0f}x faster)")
+    print(f"  tokens priced      : {len(indexed):,}\n")
+
+
+def bench_stream_parse(pool_count: int = 50_000, token_count: int = 1_000, chunk_size: int = 64 * 1024):
+    print(f"Whirlpool list decode: {pool_count:,} pools, {chunk_size // 1024} KiB chunks")
+    rng = random.Random(42)
+    tokens = make_tokens(token_count, rng)
+    body = json.dumps({'whirlpools': make_whirlpools(pool_count, tokens, rng)}).encode()
+
+    tracker = MultiDEXPriceTracker(tokens=tokens)
+
+    async def chunks():
+        for i in range(0, len(body), chunk_size):
+            yield body[i:i + chunk_size]
+
+    async def streamed():
+        return [p async for p in iter_json_array(chunks(), 'whirlpools') if tracker._is_relevant_orca_pool(p)]
+
+    def buffered():
+        return [p for p in json.loads(body)['whirlpools'] if tracker._is_relevant_orca_pool(p)]
+
+    for name, run in (("json.loads + filter", buffered), ("streaming + filter ", lambda: asyncio.run(streamed()))):
+        kept, seconds = timed(run)
+        tracemalloc.start()
+        run()
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        print(f"  {name}: {seconds * 1000:8.1f} ms, peak {peak / 2**20:7.1f} MiB, kept {len(kept):,}")
+    print(f"  body size          : {len(body) / 2**20:.1f} MiB\n")
+
+
+def make_pool_records(count: int, rng: random.Random) -> list:
+    return [PoolData(dex=rng.choice(('Orca', 'Raydium', 'Meteora')), token_a=f"TOK{rng.randrange(5_000)}",
+                     token_b='USDC', price=rng.uniform(0.01, 100), liquidity_usd=rng.uniform(1e4, 1e7),
+                     volume_24h=rng.uniform(0, 1e6), fee_rate=0.003, pool_address=random_mint(rng))
+            for _ in range(count)]
+
+
+def bench_pool_table(pool_count: int = 100_000):
+    print(f"Pool storage: {pool_count:,} pools")
+    rng = random.Random(42)
+    # Records are decoded inside the measurement so each store is charged for the strings it keeps
+    body = json.dumps([p.to_dict() for p in make_pool_records(pool_count, rng)])
+
+    def as_list():
+        return [PoolData(**fields) for fields in json.loads(body)]
+
+    def as_table():
+        table = PoolTable()
+        for fields in json.loads(body):
+            table.upsert(PoolData(**fields))
+        return table
+
+    for name, build in (("List[PoolData]", as_list), ("PoolTable     ", as_table)):
+        tracemalloc.start()
+        store = build()
+        retained, _ = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        del store
+        print(f"  {name} : {retained / 2**20:7.1f} MiB retained")
+
+    records = as_list()
+    table = as_table()
+    records_liquidity, list_s = timed(lambda: sum(p.liquidity_usd for p in records if p.dex == 'Orca'))
+    table_liquidity, table_s = timed(
+        lambda: float(table.column('liquidity_usd')[table.column('dex') == table.dexes.ids['Orca']].sum()))
+    assert math.isclose(records_liquidity, table_liquidity, rel_tol=1e-9)
+    print(f"  Orca liquidity sum : list {list_s * 1000:.1f} ms, columns {table_s * 1000:.2f} ms\n")
+
+
+def make_quotes(tokens: dict, sources: list, rng: random.Random, coverage: float = 0.7) -> dict:
+    """Synthetic per-source quotes: ~1% noise around a base price, with the odd outlier"""
+    dex_prices = {dex: {} for dex in sources}
+    for symbol in tokens:
+        base = rng.uniform(0.01, 100)
+        for dex in sources:
+            if rng.random() < coverage:
+                noise = rng.choice((0.5, 1.3, 2.0)) if rng.random() < 0.05 else 1 + rng.gauss(0, 0.01)
+                dex_prices[dex][symbol] = (base * noise, rng.uniform(0, 1e6), rng.uniform(0, 1e5))
+    return dex_prices
+
+
+def legacy_filter_outliers(price_data: list) -> list:
+    """The baseline filter_outliers (deviation from the median), kept for comparison"""
+    if len(price_data) < 3:
+        return price_data
+    median = statistics.median([p[1] for p in price_data])
+    filtered = [data for data in price_data if abs(data[1] - median) / median <= mdp.MAX_PRICE_DEVIATION]
+    return filtered if filtered else price_data
+
+
+def baseline_aggregate_prices(tokens: dict, dex_prices: dict) -> dict:
+    """The baseline aggregate_prices (per-token loop, statistics-based confidence), kept for comparison"""
+    aggregated = {}
+    for symbol in tokens:
+        price_data = [(dex, *prices[symbol]) for dex, prices in dex_prices.items() if symbol in prices]
+        if not price_data:
+            continue
+
+        filtered_data = legacy_filter_outliers(price_data)
+        if len(filtered_data) >= mdp.MIN_SOURCES:
+            prices = [p[1] for p in filtered_data]
+            sources = [p[0] for p in filtered_data]
+            liquidities = [p[2] for p in filtered_data]
+            volumes = [p[3] for p in filtered_data]
+            min_price = min(prices)
+            max_price = max(prices)
+            aggregated[symbol] = {
+                'prices': prices,
+                'sources': sources,
+                'liquidities': liquidities,
+                'volumes': volumes,
+                'min': min_price,
+                'max': max_price,
+                'avg': sum(prices) / len(prices),
+                'spread_pct': ((max_price - min_price) / min_price) * 100,
+                'count': len(prices),
+                'confidence': legacy_confidence_score(prices, liquidities),
+                'total_liquidity': sum(liquidities),
+                'total_volume_24h': sum(volumes),
+            }
+    return aggregated
+
+
+def baseline_find_realistic_arbitrage(aggregated: dict) -> list:
+    """The baseline find_realistic_arbitrage (min/max pair per token), kept for comparison"""
+    opportunities = []
+    for symbol, data in aggregated.items():
+        spread_pct = data['spread_pct']
+        if (data['count'] < mdp.MIN_SOURCES or
+                spread_pct < mdp.MIN_SPREAD_THRESHOLD * 100 or
+                spread_pct > mdp.MAX_SPREAD_THRESHOLD * 100 or
+                data['confidence'] < 0.5):
+            continue
+
+        min_idx = data['prices'].index(data['min'])
+        max_idx = data['prices'].index(data['max'])
+        buy_liquidity = data['liquidities'][min_idx]
+        sell_liquidity = data['liquidities'][max_idx]
+        opportunities.append(mdp.ArbitrageRoute(
+            token=symbol,
+            buy_dex=data['sources'][min_idx],
+            buy_price=data['min'],
+            buy_liquidity=buy_liquidity,
+            sell_dex=data['sources'][max_idx],
+            sell_price=data['max'],
+            sell_liquidity=sell_liquidity,
+            spread_pct=spread_pct,
+            profit_per_token=data['max'] - data['min'],
+            max_trade_size=min(buy_liquidity, sell_liquidity) * 0.05 / data['min'],
+            confidence_score=data['confidence']
+        ))
+    return sorted(opportunities, key=lambda x: x.confidence_score * x.spread_pct, reverse=True)
+
+
+def baseline_pipeline(tokens: dict, dex_prices: dict):
+    aggregated = baseline_aggregate_prices(tokens, dex_prices)
+    return aggregated, baseline_find_realistic_arbitrage(aggregated)
+
+
+def matrix_pipeline(tracker: MultiDEXPriceTracker, dex_prices: dict):
+    aggregated = tracker.aggregate_prices(dex_prices)
+    return aggregated, tracker.find_realistic_arbitrage(aggregated)
+
+
+def bench_aggregate(token_count: int = 5_000):
+    sources = list(mdp.SOURCE_URLS)
+    print(f"Aggregation: {token_count:,} tokens x {len(sources)} sources")
+    rng = random.Random(42)
+    tokens = make_tokens(token_count, rng)
+    dex_prices = make_quotes(tokens, sources, rng)
+    tracker = MultiDEXPriceTracker(tokens=tokens)
+
+    # Both sides aggregate every token and rank the min/max routes
+    (baseline, baseline_routes), baseline_s = timed(baseline_pipeline, tokens, dex_prices)
+    (matrix, matrix_routes), matrix_s = timed(matrix_pipeline, tracker, dex_prices)
+    # The view builds its dicts on first read; this is what output (JSON, display) pays
+    materialized, dicts_s = timed(dict, matrix)
+
+    assert list(baseline) == list(matrix), "matrix aggregation disagrees with the baseline"
+    assert all(math.isclose(baseline[s]['avg'], materialized[s]['avg'], rel_tol=1e-9) for s in baseline)
+    assert {r.token for r in baseline_routes} == {r.token for r in matrix_routes}
+    print(f"  baseline loop      : {baseline_s * 1000:10.1f} ms  (aggregate_prices + find_realistic_arbitrage)")
+    print(f"  price matrix       : {matrix_s * 1000:10.1f} ms  ({baseline_s / matrix_s:,.1f}x faster)")
+    print(f"  + build all dicts  : {dicts_s * 1000:10.1f} ms  (dict(view), on output only)")
+
+    # The NumPy pass alone
+    engine = PriceMatrix(len(tracker.token_ids), len(sources))
+    for column, prices in enumerate(dex_prices.values()):
+        engine.load_source(column, {tracker.token_ids.ids[s]: quote for s, quote in prices.items()})
+    _, core_s = timed(engine.aggregate, mdp.MIN_SOURCES, mdp.MAX_PRICE_DEVIATION, 'pct', mdp.OUTLIER_MAD_THRESHOLD,
+                      mdp.CONFIDENCE_WEIGHTS, (mdp.CONFIDENCE_SOURCE_CAP, mdp.CONFIDENCE_LIQUIDITY_CAP))
+    print(f"  matrix core only   : {core_s * 1000:10.1f} ms")
+    print(f"  tokens aggregated  : {len(matrix):,}")
+
+    # Next cycle: one source re-quotes 1% of the tokens; only those are re-aggregated and re-checked
+    changed = dict(dex_prices[sources[0]])
+    for symbol in rng.sample(list(changed), len(changed) // 100):
+        price, liquidity, volume = changed[symbol]
+        changed[symbol] = (price * 1.001, liquidity, volume)
+    next_prices = {**dex_prices, sources[0]: changed}
+    (incremental, _), incremental_s = timed(matrix_pipeline, tracker, next_prices)
+    full = baseline_aggregate_prices(tokens, next_prices)
+    assert list(full) == list(incremental)
+    assert all(math.isclose(full[s]['avg'], incremental[s]['avg'], rel_tol=1e-9) for s in full)
+    print(f"  1% changed, incr.  : {incremental_s * 1000:10.1f} ms  (aggregate_prices + find_realistic_arbitrage)\n")
+
+
+def bench_outlier_filter(token_count: int = 10_000, source_count: int = 32):
+    print(f"Outlier filter: {token_count:,} tokens x {source_count} sources (e.g. one column per pool)")
+    rng = random.Random(42)
+    sources = [f"pool{i}" for i in range(source_count)]
+    tokens = {f"TOK{i}": str(i) for i in range(token_count)}
+    dex_prices = make_quotes(tokens, sources, rng)
+
+    engine = PriceMatrix(token_count, source_count)
+    for column, prices in enumerate(dex_prices.values()):
+        engine.load_source(column, {int(symbol[3:]): quote for symbol, quote in prices.items()})
+    price, mask = engine.price[:token_count], engine.mask[:token_count]
+    per_token = [[(dex, *prices[symbol]) for dex, prices in dex_prices.items() if symbol in prices]
+                 for symbol in tokens]
+
+    legacy, legacy_s = timed(lambda: [legacy_filter_outliers(quotes) for quotes in per_token])
+    pct, pct_s = timed(robust_outlier_mask, price, mask, mdp.MAX_PRICE_DEVIATION, 'pct', mdp.OUTLIER_MAD_THRESHOLD)
+    _, mad_s = timed(robust_outlier_mask, price, mask, mdp.MAX_PRICE_DEVIATION, 'mad', mdp.OUTLIER_MAD_THRESHOLD)
+
+    assert [len(quotes) for quotes in legacy] == pct.sum(axis=1).tolist()
+    print(f"  per-token filter   : {legacy_s * 1000:10.1f} ms")
+    print(f"  batch, pct         : {pct_s * 1000:10.1f} ms  ({legacy_s / pct_s:,.0f}x faster)")
+    print(f"  batch, MAD         : {mad_s * 1000:10.1f} ms\n")
+
+
+def legacy_confidence_score(prices: list, liquidities: list) -> float:
+    """The original calculate_confidence_score (separate mean/stdev/sum passes), kept for comparison"""
+    if len(prices) < mdp.MIN_SOURCES:
+        return 0.0
+    source_score = min(len(prices) / 5.0, 1.0)
+    if len(prices) > 1:
+        consistency_score = max(0, 1 - (statistics.stdev(prices) / statistics.mean(prices)))
+    else:
+        consistency_score = 0.5
+    liquidity_score = min(sum(liquidities) / 100000, 1.0)
+    return round(source_score * 0.4 + consistency_score * 0.4 + liquidity_score * 0.2, 3)
+
+
+def bench_confidence(token_count: int = 10_000):
+    sources = list(mdp.SOURCE_URLS)
+    print(f"Confidence scoring: {token_count:,} tokens x {len(sources)} sources")
+    rng = random.Random(42)
+    tokens = {f"TOK{i}": str(i) for i in range(token_count)}
+    dex_prices = make_quotes(tokens, sources, rng)
+    tracker = MultiDEXPriceTracker(tokens=tokens)
+
+    engine = PriceMatrix(token_count, len(sources))
+    for column, prices in enumerate(dex_prices.values()):
+        engine.load_source(column, {int(symbol[3:]): quote for symbol, quote in prices.items()})
+    price, liquidity, mask = engine.price[:token_count], engine.liquidity[:token_count], engine.mask[:token_count]
+    per_token = [([prices[s][0] for prices in dex_prices.values() if s in prices],
+                  [prices[s][1] for prices in dex_prices.values() if s in prices]) for s in tokens]
+
+    legacy, legacy_s = timed(lambda: [legacy_confidence_score(p, l) for p, l in per_token])
+    single, single_s = timed(lambda: [tracker.calculate_confidence_score(p, l) for p, l in per_token])
+    (kernel, _, _), kernel_s = timed(confidence_kernel, price, liquidity, mask, mdp.MIN_SOURCES,
+                                     mdp.CONFIDENCE_WEIGHTS, mdp.CONFIDENCE_SOURCE_CAP, mdp.CONFIDENCE_LIQUIDITY_CAP)
+
+    # Scores are rounded to 3 decimals; float rounding may differ by one unit at a .0005 boundary
+    assert all(abs(a - b) <= 0.0011 for a, b in zip(legacy, single))
+    assert all(abs(a - b) <= 0.0011 for a, b in zip(legacy, kernel.tolist()))
+    print(f"  legacy (statistics): {legacy_s * 1000:10.1f} ms")
+    print(f"  per-token Welford  : {single_s * 1000:10.1f} ms")
+    print(f"  vectorized kernel  : {kernel_s * 1000:10.1f} ms  ({legacy_s / kernel_s:,.0f}x faster)\n")
+
+
+def bench_pair_arbitrage(token_count: int = 5_000):
+    sources = list(mdp.SOURCE_URLS)
+    print(f"Arbitrage routes: {token_count:,} tokens x {len(sources)} sources")
+    rng = random.Random(42)
+    tokens = {f"TOK{i}": str(i) for i in range(token_count)}
+    tracker = MultiDEXPriceTracker(tokens=tokens)
+    aggregated = tracker.aggregate_prices(make_quotes(tokens, sources, rng))
+
+    def expected_profit(routes):
+        return sum(r.profit_per_token * r.max_trade_size for r in routes)
+
+    min_max, min_max_s = timed(tracker.find_realistic_arbitrage, aggregated)
+    pairs, pairs_s = timed(tracker.find_pair_arbitrage)
+    print(f"  min/max pair       : {min_max_s * 1000:10.1f} ms  {len(min_max):6,} routes, "
+          f"${expected_profit(min_max):,.0f} gross of fees")
+    print(f"  all pairs, net fees: {pairs_s * 1000:10.1f} ms  {len(pairs):6,} routes, "
+          f"${expected_profit(pairs):,.0f} net of fees\n")
+
+
+class InstantResponse:
+    def __init__(self, payload):
+        self.status = 200
+        self.headers = {}
+        self._payload = payload
+
+    async def json(self):
+        return self._payload
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+
+class InstantSession:
+    """Answers Jupiter and Birdeye batch price requests immediately, so only the rate limits cost time"""
+
+    def __init__(self):
+        self.requests = 0
+
+    def get(self, url, headers=None):
+        self.requests += 1
+        query = parse_qs(urlparse(url).query)
+        mints = (query.get('ids') or query['list_address'])[0].split(',')
+        quote = {'price': 1.0, 'value': 1.0, 'liquidity': 1e6, 'volume24h': 1e5, 'v24hUSD': 1e5}
+        return InstantResponse({'data': {mint: quote for mint in mints}})
+
+    async def close(self):
+        pass
+
+
+def bench_source_budget(token_count: int = 5_000):
+    print(f"Batch sources at {token_count:,} tokens (instant API, real rate limits; takes about a minute)")
+    rng = random.Random(42)
+    tracker = MultiDEXPriceTracker(tokens=make_tokens(token_count, rng))
+    tracker.session = InstantSession()
+
+    names = ('Jupiter', 'Birdeye')
+    for name in names:
+        source = tracker.sources[name]
+        print(f"  {name:8}: {tracker._requests_per_poll(name):4} requests per poll at {source.rate_limit[0]:g}/s"
+              f" -> timeout {source.timeout:5.1f} s, poll every {source.poll_interval:5.1f} s")
+
+    async def fetch_all():
+        return await asyncio.gather(*(tracker._timed_fetch(name) for name in names))
+
+    for name, prices in zip(names, asyncio.run(fetch_all())):
+        assert len(prices) == token_count + 1
+        print(f"  {name:8}: {len(prices):,} tokens priced in {tracker.source_latency[name]:5.1f} s, "
+              f"breaker {tracker.source_health()[name]['state']}")
+    print()
+
+
+if __name__ == "__main__":
+    bench_pool_scan()
+    bench_stream_parse()
+    bench_pool_table()
+    bench_aggregate()
+    bench_outlier_filter()
+    bench_confidence()
+    bench_pair_arbitrage()
+    bench_source_budget()
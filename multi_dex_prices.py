@@ -1,10 +1,24 @@
 import asyncio
 import aiohttp
+import codecs
 import json
+import math
+import os
+import random
+import re
 import ssl
-from datetime import datetime
-from typing import Dict, List, Optional, Tuple
-from dataclasses import dataclass, asdict
+import time
+from collections import defaultdict, deque
+from collections.abc import Mapping
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import AsyncIterator, Awaitable, Callable, Dict, List, Optional, Tuple
+from urllib.parse import urlparse
+from dataclasses import dataclass, asdict, field
+
+import numpy as np
+
+from price_matrix import PriceMatrix, rank_pairs, robust_outlier_mask
 
 # SSL CONTEXT - Development only
 ssl_context = ssl.create_default_context()
@@ -23,7 +37,77 @@ TOKENS = {
 }
 
 USDC_MINT = TOKENS['USDC']
+TOKENS_FILE = None   # JSON token list ({symbol: mint} or [{symbol, address}, ...]) replacing TOKENS when set
 UPDATE_INTERVAL = 2  # seconds
+SCHEDULED_POLLING = True   # poll each source on its own cadence instead of in lock-step cycles
+# Cycle mode only (SCHEDULED_POLLING = False); no effect while the scheduler runs:
+CYCLE_DEADLINE = 0.4 # seconds to wait for sources before aggregating partial results (None = wait for all)
+STREAMING_PIPELINE = True  # merge/aggregate/detect per source as results arrive
+QUOTE_MAX_AGE = 10   # seconds before a quote is dropped (at least 3 poll intervals of its source)
+
+# TOKEN DISCOVERY (optional): track every mint with liquid USDC pools on enough DEXes instead of TOKENS
+TOKEN_DISCOVERY = False
+TOKEN_DISCOVERY_INTERVAL = 900  # seconds between market-wide pool list scans
+
+# HTTP fan-out
+PER_HOST_CONCURRENCY = 10     # Max in-flight requests per API host (default per-source limit)
+MAX_IN_FLIGHT_REQUESTS = 20   # Max in-flight requests across all hosts
+SOURCE_TIMEOUT = 10           # seconds a single source fetch may take (plus the time its rate limit needs, see below)
+BIRDEYE_BATCH_SIZE = 100      # Mints per Birdeye multi_price request, the API maximum (0 = one request per mint)
+JUPITER_BATCH_SIZE = 100      # Mints per Jupiter price request, the API maximum
+MAX_URL_LENGTH = 8000         # characters; fits a full 100-mint chunk, under common 8 KB server limits
+RAYDIUM_PER_MINT_LIMIT = 200  # above this many tokens, Raydium is read from its liquidity-sorted pool list
+RAYDIUM_LIST_PAGES = 5        # pages scanned per poll in pool-list mode
+RAYDIUM_LIST_PAGE_SIZE = 1000
+STREAM_CHUNK_SIZE = 64 * 1024 # bytes read per step when streaming the large pool lists
+
+# POLL CADENCE per source (seconds). Jupiter prices everything in one call; the pool lists change slowly.
+SOURCE_POLL_INTERVALS = {
+    'Jupiter': 1.0,
+    'Raydium': 2.0,
+    'Orca': 10.0,
+    'Birdeye': 3.0,
+    'Meteora': 10.0,
+}
+# A poll of a built-in source never asks for more than its rate limit refills: with many tokens the poll
+# interval grows to (requests per poll) / rate, and the timeout to SOURCE_TIMEOUT + the bucket's drain time.
+POLL_JITTER = 0.1             # +/- fraction of the poll interval, so sources do not fire in lock-step
+
+# VOLATILITY-ADAPTIVE POLLING (per-token refresh for the per-mint sources, Raydium and Birdeye)
+ADAPTIVE_POLLING = False
+ADAPTIVE_MIN_INTERVAL = 0.5   # seconds, for tokens whose spread is at MIN_SPREAD_THRESHOLD or that move fast
+ADAPTIVE_MAX_INTERVAL = 15.0  # seconds, for quiet tokens
+ADAPTIVE_VOL_REFERENCE = 0.001 # EWMA of |log return| per second treated as fully "hot"
+ADAPTIVE_EWMA_ALPHA = 0.3
+
+# RATE LIMITS per source: (requests/second, burst). Tune to the API plan in use.
+RATE_LIMITS = {
+    'Jupiter': (10.0, 10),
+    'Raydium': (10.0, 20),
+    'Orca': (5.0, 10),
+    'Birdeye': (1.0, 5),
+    'Meteora': (5.0, 10),
+}
+RATE_LIMIT_RETRIES = 2        # retries of a request answered with 429
+RATE_LIMIT_MAX_WAIT = 5       # seconds; longer Retry-After values are not waited out in-request
+
+# HEDGED REQUESTS (optional): duplicate a request that is slower than the host's observed p95
+HEDGE_QUANTILE = 0.95         # latency quantile after which a hedge is fired
+HEDGE_BUDGET = 0.05           # max hedges as a fraction of requests per host
+HEDGE_MIN_SAMPLES = 20        # latency samples needed before hedging a host
+HEDGE_WINDOW = 200            # latency samples kept per host
+
+# CIRCUIT BREAKER (per source)
+BREAKER_FAILURE_THRESHOLD = 3 # consecutive failures before a source is skipped
+BREAKER_BASE_BACKOFF = 5      # seconds before the first half-open probe
+BREAKER_MAX_BACKOFF = 300     # backoff doubles per failed probe up to this cap
+
+# POOL STORE (pools kept for GPU multi-hop routing)
+POOL_MAX_MISSED_CYCLES = 5    # a pool absent from this many successful fetches of its DEX is evicted
+
+# POOL DISCOVERY (two-tier mode: slow full-list scan, fast per-pool refresh)
+POOL_DISCOVERY_INTERVAL = 300 # seconds between full Orca/Meteora list scans
+POOL_INDEX_FILE = "pool_index.json"
 
 # REALISTIC ARBITRAGE FILTERS
 MIN_SPREAD_THRESHOLD = 0.005  # 0.5% minimum spread
@@ -31,13 +115,156 @@ MAX_SPREAD_THRESHOLD = 0.20   # 20% maximum spread (higher = likely fake)
 MIN_LIQUIDITY_USD = 10000     # $10k minimum pool liquidity
 MIN_SOURCES = 2               # Minimum number of DEXes reporting price
 MAX_PRICE_DEVIATION = 0.30    # 30% max deviation from median (outlier filter)
+MAX_TRADE_FRACTION = 0.05     # max trade size as a fraction of the shallower pool's liquidity
+OUTLIER_METHOD = 'pct'        # 'pct': MAX_PRICE_DEVIATION from median, 'mad': robust z-score (many sources)
+OUTLIER_MAD_THRESHOLD = 3.5   # max |price - median| / (1.4826 * MAD) with OUTLIER_METHOD = 'mad'
+
+# ALL-PAIRS ARBITRAGE (optional): rank every buy/sell source pair after fees and depth, not just min/max
+ALL_PAIRS_ARBITRAGE = False
+DEFAULT_FEE_RATE = 0.003      # per swap, for sources without a tracked pool for the token
+SOURCE_FEE_RATES = {'Raydium': 0.0025}
+
+# CONFIDENCE SCORE: weighted sum of source count, price consistency and liquidity scores
+CONFIDENCE_WEIGHTS = (0.4, 0.4, 0.2)  # (sources, consistency, liquidity)
+CONFIDENCE_SOURCE_CAP = 5             # sources at which the source score saturates
+CONFIDENCE_LIQUIDITY_CAP = 100000     # USD at which the liquidity score saturates
 
 # API Endpoints
 JUPITER_PRICE_URL = "https://api.jup.ag/price/v2"
 RAYDIUM_URL = "https://api-v3.raydium.io/pools/info/mint"
+RAYDIUM_POOL_LIST_URL = "https://api-v3.raydium.io/pools/info/list"
 ORCA_WHIRLPOOL_URL = "https://api.mainnet.orca.so/v1/whirlpool/list"
 BIRDEYE_URL = "https://public-api.birdeye.so/defi/price"
+BIRDEYE_MULTI_PRICE_URL = "https://public-api.birdeye.so/defi/multi_price"
 METEORA_URL = "https://dlmm-api.meteora.ag/pair/all"
+ORCA_POOL_URL = "https://api.orca.so/v2/solana/pools"       # /{address}
+METEORA_PAIR_URL = "https://dlmm-api.meteora.ag/pair"       # /{address}
+
+# Endpoints used by each source (their hosts share the source's rate limit)
+SOURCE_URLS = {
+    'Jupiter': [JUPITER_PRICE_URL],
+    'Raydium': [RAYDIUM_URL, RAYDIUM_POOL_LIST_URL],
+    'Orca': [ORCA_WHIRLPOOL_URL, ORCA_POOL_URL],
+    'Birdeye': [BIRDEYE_URL, BIRDEYE_MULTI_PRICE_URL],
+    'Meteora': [METEORA_URL, METEORA_PAIR_URL],
+}
+
+
+def build_token_map(entries: List[Tuple[Optional[str], str]]) -> Dict[str, str]:
+    """Turn (symbol, mint) pairs into a symbol -> mint table.
+    
+    Symbols are not unique across Solana, so a repeated symbol is suffixed with the
+    start of its mint (e.g. "USDC_Gh9Z"). USDC is always included as the quote token.
+    """
+    tokens = {'USDC': USDC_MINT}
+    seen_mints = {USDC_MINT}
+    for symbol, mint in entries:
+        if not mint or mint in seen_mints:
+            continue
+        symbol = symbol or mint[:8]
+        if symbol in tokens:
+            symbol = f"{symbol}_{mint[:4]}"
+        tokens[symbol] = mint
+        seen_mints.add(mint)
+    return tokens
+
+
+def load_tokens(path: str) -> Dict[str, str]:
+    """Load a token universe from JSON: {symbol: mint} or a list of {symbol, address|mint} entries"""
+    with open(path) as f:
+        data = json.load(f)
+    
+    if isinstance(data, dict):
+        return build_token_map(list(data.items()))
+    return build_token_map([(item.get('symbol'), item.get('address') or item.get('mint')) for item in data])
+
+
+def chunk_query_values(prefix: str, values: List[str], max_items: int,
+                       max_length: int = MAX_URL_LENGTH) -> List[List[str]]:
+    """Split `values` into chunks whose `prefix + ','.join(chunk)` URL stays within `max_length`"""
+    chunks = []
+    chunk: List[str] = []
+    length = len(prefix)
+    for value in values:
+        extra = len(value) + (1 if chunk else 0)
+        if chunk and (len(chunk) >= max_items or length + extra > max_length):
+            chunks.append(chunk)
+            chunk, length, extra = [], len(prefix), len(value)
+        chunk.append(value)
+        length += extra
+    if chunk:
+        chunks.append(chunk)
+    return chunks
+
+
+_JSON_ARRAY_SEPARATORS = re.compile(r'[\s,]*')
+_JSON_SCALAR_TERMINATORS = frozenset(' \t\r\n,]')
+
+
+async def iter_json_array(chunks: AsyncIterator[bytes], key: Optional[str] = None) -> AsyncIterator:
+    """Yield the elements of a JSON array one by one while the body is still streaming in.
+    
+    With `key` the array is the value of that key in the top-level object
+    (e.g. Orca's {"whirlpools": [...]}); otherwise the body itself is the array.
+    Only the current element and the unread tail of the last chunk are held in memory.
+    """
+    decoder = json.JSONDecoder()
+    utf8 = codecs.getincrementaldecoder('utf-8')()
+    chunks = chunks.__aiter__()
+    buf = ''
+    pos = 0
+    
+    async def fill() -> bool:
+        nonlocal buf, pos
+        try:
+            chunk = await chunks.__anext__()
+        except StopAsyncIteration:
+            return False
+        buf = buf[pos:] + utf8.decode(chunk)
+        pos = 0
+        return True
+    
+    # Find the opening bracket of the target array
+    marker = '[' if key is None else f'"{key}"'
+    while (start := buf.find(marker, pos)) < 0:
+        pos = max(pos, len(buf) - len(marker))
+        if not await fill():
+            raise ValueError(f"JSON array {key or ''!r} not found in response")
+    if key is not None:
+        pos = start + len(marker)
+        while (start := buf.find('[', pos)) < 0:
+            pos = len(buf)
+            if not await fill():
+                raise ValueError(f"JSON array {key!r} not found in response")
+    pos = start + 1
+    
+    while True:
+        pos = _JSON_ARRAY_SEPARATORS.match(buf, pos).end()
+        if pos == len(buf):
+            if not await fill():
+                raise ValueError("truncated JSON array")
+            continue
+        if buf[pos] == ']':
+            return
+        
+        try:
+            value, end = decoder.raw_decode(buf, pos)
+        except json.JSONDecodeError:
+            # Element is split across chunks - read more and retry
+            if not await fill():
+                raise
+            continue
+        
+        # A bare number (or literal) is only complete once a separator follows it: "1." + "5" would
+        # otherwise decode as 1 and leave ".5" behind
+        if not isinstance(value, (dict, list, str)) and (end == len(buf) or buf[end] not in _JSON_SCALAR_TERMINATORS):
+            if await fill():
+                continue
+            if end < len(buf):
+                raise json.JSONDecodeError("Expecting ',' delimiter", buf, end)
+        
+        pos = end
+        yield value
 
 
 @dataclass
@@ -56,6 +283,533 @@ class PoolData:
         return asdict(self)
 
 
+@dataclass
+class PriceSource:
+    """A registered price source: fetch coroutine plus its own cost and cadence settings.
+    
+    `fetch` returns normalized quotes {symbol: (price, liquidity, volume)}. `urls` are the endpoints
+    it calls; their hosts get the source's `concurrency` limit and `rate_limit` (requests/s, burst).
+    """
+    name: str
+    fetch: Callable[[], Awaitable[Dict[str, Tuple[float, float, float]]]]
+    poll_interval: float = UPDATE_INTERVAL
+    concurrency: int = PER_HOST_CONCURRENCY
+    timeout: float = SOURCE_TIMEOUT
+    urls: List[str] = field(default_factory=list)
+    rate_limit: Optional[Tuple[float, int]] = None
+
+
+@dataclass
+class HTTPCacheEntry:
+    """Validators and decoded payload of the last 200 response for a URL"""
+    etag: Optional[str]
+    last_modified: Optional[str]
+    payload: object
+
+
+class Interner:
+    """Dense integer ids for a growing set of names (tokens, DEXes); ids are never reused"""
+    
+    def __init__(self):
+        self.ids: Dict[str, int] = {}
+        self.names: List[str] = []
+    
+    def intern(self, name: str) -> int:
+        id_ = self.ids.get(name)
+        if id_ is None:
+            id_ = self.ids[name] = len(self.names)
+            self.names.append(name)
+        return id_
+    
+    def get(self, name: str) -> Optional[int]:
+        return self.ids.get(name)
+    
+    def __len__(self) -> int:
+        return len(self.names)
+
+
+def pool_from_columns(columns: Dict[str, np.ndarray], row: int, addresses, token_names, dex_names) -> PoolData:
+    """A PoolData view of one row of the pool columns (PoolTable and PoolSnapshot)"""
+    return PoolData(
+        dex=dex_names[columns['dex'][row]],
+        token_a=token_names[columns['token_a'][row]],
+        token_b=token_names[columns['token_b'][row]],
+        price=float(columns['price'][row]),
+        liquidity_usd=float(columns['liquidity_usd'][row]),
+        volume_24h=float(columns['volume_24h'][row]),
+        fee_rate=float(columns['fee_rate'][row]),
+        pool_address=addresses[row]
+    )
+
+
+class PoolSnapshot:
+    """Immutable, sequence-numbered view of the pool table at the end of a cycle (or source merge).
+    
+    The tracker swaps a new snapshot in with a single attribute assignment, so a reader that holds
+    one sees a consistent state without locks; its columns are read-only arrays shared by all readers.
+    The 'pool' column holds pool ids, which stay the same for as long as a pool is in the table, so
+    pools can be matched across snapshots by id. `addresses` is per row (live pools only).
+    """
+    
+    def __init__(self, sequence: int, columns: Dict[str, np.ndarray], addresses: Tuple[str, ...],
+                 token_names: Tuple[str, ...], dex_names: Tuple[str, ...]):
+        self.sequence = sequence
+        self.timestamp = time.time()
+        self._columns = columns
+        self.addresses = addresses
+        self.token_names = token_names
+        self.dex_names = dex_names
+        self._rows: Optional[Dict[int, int]] = None
+        self._address_rows: Optional[Dict[str, int]] = None
+    
+    @classmethod
+    def empty(cls) -> 'PoolSnapshot':
+        return PoolTable(capacity=1).snapshot(0)
+    
+    def column(self, name: str) -> np.ndarray:
+        return self._columns[name]
+    
+    def row(self, row: int) -> PoolData:
+        return pool_from_columns(self._columns, row, self.addresses, self.token_names, self.dex_names)
+    
+    def row_of(self, pool: int) -> Optional[int]:
+        """Row of the pool with id `pool` in this snapshot, or None"""
+        if self._rows is None:
+            self._rows = {id_: row for row, id_ in enumerate(self._columns['pool'].tolist())}
+        return self._rows.get(pool)
+    
+    def get(self, pool_address: str) -> Optional[PoolData]:
+        if self._address_rows is None:
+            self._address_rows = {address: row for row, address in enumerate(self.addresses)}
+        row = self._address_rows.get(pool_address)
+        return None if row is None else self.row(row)
+    
+    def __len__(self) -> int:
+        return len(self._columns['pool'])
+    
+    def __iter__(self):
+        return (self.row(row) for row in range(len(self)))
+
+
+class AggregateView(Mapping):
+    """Read-only symbol -> aggregate dict mapping over a tracker's current state (today's dict shape).
+    
+    The keys (tokens with a valid aggregate, in token order) are fixed when the view is made; the
+    dicts are built on first read, all pending ones in one batch, so a caller that only needs the
+    opportunities never pays for them. Like dict.keys() it is live: take dict(view) for a snapshot.
+    """
+    
+    def __init__(self, tracker: 'MultiDEXPriceTracker', symbols: List[str]):
+        self.tracker = tracker
+        self._symbols = symbols
+        self._members: Optional[set] = None
+    
+    def __getitem__(self, symbol: str) -> Dict:
+        if symbol not in self:
+            raise KeyError(symbol)
+        return self.tracker._read_aggregate(symbol)
+    
+    def __contains__(self, symbol) -> bool:
+        if self._members is None:
+            self._members = set(self._symbols)
+        return symbol in self._members
+    
+    def __iter__(self):
+        return iter(self._symbols)
+    
+    def __len__(self) -> int:
+        return len(self._symbols)
+
+
+class PoolTable:
+    """Columnar pool store for the multi-hop router: float64 price/liquidity/volume/fee columns,
+    integer pool, token and DEX ids, O(1) upsert by pool address and amortized (doubling) growth.
+    
+    A pool's id (the 'pool' column) is assigned on first upsert and does not change while the pool
+    is in the table; rows are only storage positions, and evicting a pool moves the last row into
+    its place. Evicted pools' ids are reused, oldest freed first, so ids stay below the peak row count.
+    Every successful fetch of a DEX is one cycle for that DEX; pools it has not reported
+    for `max_missed_cycles` of its cycles are evicted, so memory stays bounded.
+    Fetchers stage their pools, which are applied only when the fetch succeeds (commit).
+    `version` changes whenever a pool is added, changed or evicted, so readers can skip re-snapshotting.
+    Iterating yields PoolData views for code that wants records.
+    """
+    
+    _FLOAT_COLUMNS = ('price', 'liquidity_usd', 'volume_24h', 'fee_rate')
+    _INT_COLUMNS = ('pool', 'dex', 'token_a', 'token_b', 'last_seen')
+    
+    def __init__(self, max_missed_cycles: int = POOL_MAX_MISSED_CYCLES, capacity: int = 1024,
+                 tokens: Optional[Interner] = None, dexes: Optional[Interner] = None):
+        self.max_missed_cycles = max_missed_cycles
+        # Pass the tracker's interners so pool token/DEX ids match the rest of the pipeline
+        self.tokens = tokens if tokens is not None else Interner()
+        self.dexes = dexes if dexes is not None else Interner()
+        self._size = 0
+        self.version = 0
+        self._columns: Dict[str, np.ndarray] = {}
+        for name in self._FLOAT_COLUMNS:
+            self._columns[name] = np.zeros(capacity, dtype=np.float64)
+        for name in self._INT_COLUMNS:
+            self._columns[name] = np.zeros(capacity, dtype=np.int64)
+        self._rows: Dict[int, int] = {}   # pool id -> row
+        self._ids: Dict[str, int] = {}    # address -> pool id
+        self._addresses: List[str] = []   # per row
+        self._free_ids: deque = deque()
+        self._cycles: Dict[str, int] = defaultdict(int)
+        self._staged: Dict[str, List[PoolData]] = defaultdict(list)
+    
+    def _grow(self):
+        for name, column in self._columns.items():
+            grown = np.zeros(2 * len(column), dtype=column.dtype)
+            grown[:self._size] = column[:self._size]
+            self._columns[name] = grown
+    
+    def column(self, name: str) -> np.ndarray:
+        """The live rows of a column (a view; do not hold it across upserts)"""
+        return self._columns[name][:self._size]
+    
+    def upsert(self, pool: PoolData):
+        address = pool.pool_address or f"{pool.dex}:{pool.token_a}/{pool.token_b}"
+        dex = self.dexes.intern(pool.dex)
+        token_a = self.tokens.intern(pool.token_a)
+        token_b = self.tokens.intern(pool.token_b)
+        columns = self._columns
+        
+        pool_id = self._ids.get(address)
+        if pool_id is None:
+            pool_id = self._ids[address] = self._free_ids.popleft() if self._free_ids else len(self._ids)
+            if self._size == len(columns['price']):
+                self._grow()
+                columns = self._columns
+            row = self._rows[pool_id] = self._size
+            self._addresses.append(address)
+            self._size += 1
+            self.version += 1
+        else:
+            row = self._rows[pool_id]
+            if (columns['price'][row] != pool.price or columns['liquidity_usd'][row] != pool.liquidity_usd or
+                    columns['volume_24h'][row] != pool.volume_24h or columns['fee_rate'][row] != pool.fee_rate or
+                    columns['dex'][row] != dex or columns['token_a'][row] != token_a or
+                    columns['token_b'][row] != token_b):
+                self.version += 1
+        
+        columns['pool'][row] = pool_id
+        columns['price'][row] = pool.price
+        columns['liquidity_usd'][row] = pool.liquidity_usd
+        columns['volume_24h'][row] = pool.volume_24h
+        columns['fee_rate'][row] = pool.fee_rate
+        columns['dex'][row] = dex
+        columns['token_a'][row] = token_a
+        columns['token_b'][row] = token_b
+        columns['last_seen'][row] = self._cycles[pool.dex]
+    
+    def stage(self, pool: PoolData):
+        """Buffer a pool from an in-progress fetch of its DEX"""
+        self._staged[pool.dex].append(pool)
+    
+    def discard(self, dex: str):
+        self._staged.pop(dex, None)
+    
+    def commit(self, dex: str) -> int:
+        """Apply a successful fetch: upsert its staged pools and close the DEX's cycle"""
+        for pool in self._staged.pop(dex, ()):
+            self.upsert(pool)
+        return self.end_cycle(dex)
+    
+    def snapshot(self, sequence: int) -> PoolSnapshot:
+        """Copy the live rows into an immutable snapshot"""
+        columns = {}
+        for name in self._columns:
+            column = self.column(name).copy()
+            column.flags.writeable = False
+            columns[name] = column
+        return PoolSnapshot(sequence, columns, tuple(self._addresses),
+                            tuple(self.tokens.names), tuple(self.dexes.names))
+    
+    def _dex_mask(self, dex: str) -> Optional[np.ndarray]:
+        dex_id = self.dexes.ids.get(dex)
+        return None if dex_id is None else self.column('dex') == dex_id
+    
+    def touch(self, dex: str, token_ids):
+        """Mark a DEX's pools for `token_ids` as seen without refetching them"""
+        mask = self._dex_mask(dex)
+        if mask is None:
+            return
+        mask &= np.isin(self.column('token_a'), np.fromiter(token_ids, dtype=np.int64))
+        self.column('last_seen')[mask] = self._cycles[dex]
+    
+    def end_cycle(self, dex: str) -> int:
+        """Close a successful fetch of `dex` and evict its stale pools; returns the number evicted"""
+        cycle = self._cycles[dex]
+        self._cycles[dex] = cycle + 1
+        mask = self._dex_mask(dex)
+        if mask is None:
+            return 0
+        
+        stale = np.flatnonzero(mask & (cycle - self.column('last_seen') >= self.max_missed_cycles))
+        # Highest rows first, so the row moved into a hole is never itself stale
+        for row in stale[::-1]:
+            self._remove(int(row))
+        return len(stale)
+    
+    def _remove(self, row: int):
+        last = self._size - 1
+        pool_ids = self._columns['pool']
+        pool_id = int(pool_ids[row])
+        del self._rows[pool_id]
+        del self._ids[self._addresses[row]]
+        self._free_ids.append(pool_id)
+        if row != last:
+            for column in self._columns.values():
+                column[row] = column[last]
+            self._addresses[row] = self._addresses[last]
+            self._rows[int(pool_ids[row])] = row
+        self._addresses.pop()
+        self._size = last
+        self.version += 1
+    
+    def row(self, row: int) -> PoolData:
+        return pool_from_columns(self._columns, row, self._addresses, self.tokens.names, self.dexes.names)
+    
+    def get(self, pool_address: str) -> Optional[PoolData]:
+        pool_id = self._ids.get(pool_address)
+        row = None if pool_id is None else self._rows.get(pool_id)
+        return None if row is None else self.row(row)
+    
+    def for_dex(self, dex: str) -> List[PoolData]:
+        mask = self._dex_mask(dex)
+        return [] if mask is None else [self.row(int(row)) for row in np.flatnonzero(mask)]
+    
+    def __len__(self) -> int:
+        return self._size
+    
+    def __iter__(self):
+        return (self.row(row) for row in range(self._size))
+
+
+class TokenBucket:
+    """Async token bucket for one API host, also honouring server-side Retry-After / rate-limit resets"""
+    
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.capacity = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+    
+    async def acquire(self):
+        while True:
+            now = time.monotonic()
+            if now < self.blocked_until:
+                await asyncio.sleep(self.blocked_until - now)
+                continue
+            
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return
+            await asyncio.sleep((1 - self.tokens) / self.rate)
+    
+    def blocked_for(self) -> float:
+        """Seconds left of a server-imposed pause"""
+        return max(0.0, self.blocked_until - time.monotonic())
+    
+    def pause(self, seconds: float):
+        """Block the bucket for `seconds` (e.g. after a 429) and drain it"""
+        self.blocked_until = max(self.blocked_until, time.monotonic() + seconds)
+        self.tokens = 0.0
+    
+    def update_from_headers(self, headers):
+        """Pause until the advertised reset when the server says the quota is used up"""
+        remaining = headers.get('X-RateLimit-Remaining', headers.get('RateLimit-Remaining'))
+        reset = headers.get('X-RateLimit-Reset', headers.get('RateLimit-Reset'))
+        try:
+            if remaining is None or reset is None or int(float(remaining)) > 0:
+                return
+            reset = float(reset)
+        except ValueError:
+            return
+        # Reset is either an epoch timestamp or a delay in seconds
+        self.pause(reset - time.time() if reset > 1e9 else reset)
+
+
+def retry_after_seconds(value: Optional[str], default: float = 1.0) -> float:
+    """Parse a Retry-After header (delay in seconds or HTTP date)"""
+    if not value:
+        return default
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, (parsedate_to_datetime(value) - datetime.now(timezone.utc)).total_seconds())
+    except (TypeError, ValueError):
+        return default
+
+
+class RateLimitedError(Exception):
+    """A request still answered 429 after its retries, or asked for a wait over RATE_LIMIT_MAX_WAIT.
+    
+    The source is throttled, not broken: its last quotes are kept and its circuit breaker is not fed.
+    """
+    
+    def __init__(self, host: str, retry_after: float):
+        super().__init__(f"{host} rate limited (429), retry after {retry_after:.1f}s")
+        self.host = host
+        self.retry_after = retry_after
+
+
+class AdaptiveRefreshPolicy:
+    """Per-token refresh intervals driven by live volatility and spread.
+    
+    Each token gets an urgency in [0, 1]: the larger of its spread relative to MIN_SPREAD_THRESHOLD
+    and its EWMA volatility relative to `vol_reference`. The refresh interval moves geometrically from
+    `max_interval` (urgency 0) to `min_interval` (urgency 1). Due times are tracked per source.
+    Tokens and sources are the tracker's integer ids.
+    """
+    
+    def __init__(self, min_interval: float = ADAPTIVE_MIN_INTERVAL,
+                 max_interval: float = ADAPTIVE_MAX_INTERVAL,
+                 vol_reference: float = ADAPTIVE_VOL_REFERENCE,
+                 alpha: float = ADAPTIVE_EWMA_ALPHA):
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.vol_reference = vol_reference
+        self.alpha = alpha
+        self.intervals: Dict[int, float] = {}
+        self.volatility: Dict[int, float] = {}
+        self._last: Dict[int, Tuple[float, float]] = {}        # token -> (avg price, monotonic time)
+        self._next_due: Dict[Tuple[int, int], float] = {}      # (source, token) -> monotonic time
+    
+    def observe(self, token: int, price: float, spread_pct: float):
+        """Update a token's volatility and interval from its aggregate (average price and spread)"""
+        now = time.monotonic()
+        
+        last = self._last.get(token)
+        if last and last[0] > 0 and price > 0 and now > last[1]:
+            rate = abs(math.log(price / last[0])) / (now - last[1])
+            previous = self.volatility.get(token, rate)
+            self.volatility[token] = self.alpha * rate + (1 - self.alpha) * previous
+        self._last[token] = (price, now)
+        
+        spread_urgency = spread_pct / (MIN_SPREAD_THRESHOLD * 100)
+        vol_urgency = self.volatility.get(token, 0.0) / self.vol_reference
+        urgency = min(max(spread_urgency, vol_urgency), 1.0)
+        self.intervals[token] = self.max_interval * (self.min_interval / self.max_interval) ** urgency
+    
+    def due(self, source: int, tokens: List[int]) -> List[int]:
+        """Tokens `source` should refresh now; their next due time is pushed out by their interval"""
+        now = time.monotonic()
+        horizon = now + self.min_interval / 2   # sources tick every min_interval; avoid missing a tick
+        due = []
+        for token in tokens:
+            key = (source, token)
+            if self._next_due.get(key, 0.0) <= horizon:
+                due.append(token)
+                self._next_due[key] = now + self.intervals.get(token, UPDATE_INTERVAL)
+        return due
+
+
+class HedgePolicy:
+    """Decides when to hedge a request: after the host's observed latency quantile, within a budget"""
+    
+    def __init__(self, quantile: float = HEDGE_QUANTILE, budget: float = HEDGE_BUDGET,
+                 min_samples: int = HEDGE_MIN_SAMPLES, window: int = HEDGE_WINDOW):
+        self.quantile = quantile
+        self.budget = budget
+        self.min_samples = min_samples
+        self.latencies: Dict[str, deque] = defaultdict(lambda: deque(maxlen=window))
+        self.requests: Dict[str, int] = defaultdict(int)
+        self.hedges: Dict[str, int] = defaultdict(int)
+    
+    def hedge_delay(self, host: str) -> Optional[float]:
+        """Seconds to wait before hedging a request to `host`, or None if there is too little history"""
+        samples = self.latencies[host]
+        if len(samples) < self.min_samples:
+            return None
+        ordered = sorted(samples)
+        return ordered[min(len(ordered) - 1, math.ceil(self.quantile * len(ordered)) - 1)]
+    
+    def try_hedge(self, host: str) -> bool:
+        """Reserve a hedge for `host` if that keeps hedges within the budget"""
+        if self.hedges[host] + 1 > self.budget * self.requests[host]:
+            return False
+        self.hedges[host] += 1
+        return True
+    
+    def record(self, host: str, latency: float):
+        self.latencies[host].append(latency)
+    
+    def stats(self) -> Dict[str, Dict]:
+        return {
+            host: {'requests': self.requests[host], 'hedges': self.hedges[host], 'p_delay': self.hedge_delay(host)}
+            for host in self.requests
+        }
+
+
+class CircuitBreaker:
+    """Per-source circuit breaker.
+    
+    closed -> open after `failure_threshold` consecutive failures. While open the source is not
+    called at all; once the backoff expires a single half-open probe is allowed. A successful probe
+    closes the breaker, a failed one reopens it with the backoff doubled (capped at `max_backoff`).
+    """
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+    
+    def __init__(self, failure_threshold: int = BREAKER_FAILURE_THRESHOLD,
+                 base_backoff: float = BREAKER_BASE_BACKOFF,
+                 max_backoff: float = BREAKER_MAX_BACKOFF):
+        self.failure_threshold = failure_threshold
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        self.state = self.CLOSED
+        self.failures = 0          # consecutive failures
+        self.trips = 0             # consecutive times opened without a success in between
+        self.retry_at = 0.0        # monotonic time of the next half-open probe
+        self.last_error: Optional[str] = None
+    
+    def allow(self) -> bool:
+        """Whether the source may be called now (moves open -> half-open when the backoff expires)"""
+        if self.state == self.CLOSED:
+            return True
+        if self.state == self.OPEN and time.monotonic() >= self.retry_at:
+            self.state = self.HALF_OPEN
+            return True
+        return False
+    
+    def record_success(self):
+        self.state = self.CLOSED
+        self.failures = 0
+        self.trips = 0
+        self.last_error = None
+    
+    def record_rate_limited(self, retry_after: float):
+        """A call answered 429: not a failure, but a half-open probe is retried after `retry_after`"""
+        if self.state == self.HALF_OPEN:
+            self.state = self.OPEN
+            self.retry_at = time.monotonic() + retry_after
+    
+    def record_failure(self, error: Exception):
+        self.failures += 1
+        self.last_error = f"{type(error).__name__}: {error}".rstrip(': ')
+        if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+            self.trips += 1
+            backoff = min(self.base_backoff * 2 ** (self.trips - 1), self.max_backoff)
+            self.retry_at = time.monotonic() + backoff
+            self.state = self.OPEN
+    
+    def to_dict(self) -> Dict:
+        return {
+            'state': self.state,
+            'consecutive_failures': self.failures,
+            'retry_in': max(0.0, self.retry_at - time.monotonic()) if self.state == self.OPEN else 0.0,
+            'last_error': self.last_error,
+        }
+
+
 @dataclass
 class ArbitrageRoute:
     """Single arbitrage opportunity"""
@@ -70,396 +824,1445 @@ class ArbitrageRoute:
     profit_per_token: float
     max_trade_size: float
     confidence_score: float
+    net_spread_pct: Optional[float] = None  # after both swap fees (all-pairs mode)
     
     def to_dict(self):
         return asdict(self)
 
 
 class MultiDEXPriceTracker:
-    def __init__(self):
+    def __init__(self, per_host_concurrency: int = PER_HOST_CONCURRENCY,
+                 birdeye_batch_size: int = BIRDEYE_BATCH_SIZE,
+                 pool_discovery: bool = False,
+                 discovery_interval: float = POOL_DISCOVERY_INTERVAL,
+                 pool_index_file: Optional[str] = POOL_INDEX_FILE,
+                 cycle_deadline: Optional[float] = CYCLE_DEADLINE,
+                 hedge_policy: Optional[HedgePolicy] = None,
+                 adaptive_polling: bool = ADAPTIVE_POLLING,
+                 tokens: Optional[Dict[str, str]] = None,
+                 token_discovery: bool = TOKEN_DISCOVERY,
+                 token_discovery_interval: float = TOKEN_DISCOVERY_INTERVAL,
+                 confidence_weights: Tuple[float, float, float] = CONFIDENCE_WEIGHTS):
         self.prices: Dict[str, Dict[str, float]] = {}
-        self.pools: List[PoolData] = []  # For GPU multi-hop routing
+        # Integer ids for tokens and DEXes; strings are used only by fetchers and for output
+        self.token_ids = Interner()
+        self.dex_ids = Interner()
+        
+        # Pools for GPU multi-hop routing: fetchers write the table, readers use pool_snapshot
+        self.pools = PoolTable(tokens=self.token_ids, dexes=self.dex_ids)
+        self.pool_snapshot = PoolSnapshot.empty()
+        self._published_version = self.pools.version
         self.session: Optional[aiohttp.ClientSession] = None
+        self.per_host_concurrency = per_host_concurrency
+        self._host_semaphores: Dict[str, asyncio.Semaphore] = {}
+        self._request_slots = asyncio.Semaphore(MAX_IN_FLIGHT_REQUESTS)
+        self._http_cache: Dict[str, HTTPCacheEntry] = {}
+        self.hedge_policy = hedge_policy   # None disables hedging
+        self._rate_limiters: Dict[str, TokenBucket] = {}
+        self.birdeye_batch_size = birdeye_batch_size
+        self.confidence_weights = confidence_weights
         
+        # Per-token refresh for the per-mint sources (None = refresh every token on every poll)
+        self.refresh_policy = AdaptiveRefreshPolicy() if adaptive_polling else None
+        
+        # Token universe (symbol -> mint) and the O(1) mint lookup used by the pool list scans
+        self.tokens: Dict[str, str] = dict(tokens if tokens is not None else TOKENS)
+        self._mint_to_symbol: Dict[str, str] = {mint: symbol for symbol, mint in self.tokens.items()}
+        self._quote_mints = {USDC_MINT}
+        for symbol in self.tokens:
+            self.token_ids.intern(symbol)
+        
+        # Token discovery mode: the universe is replaced by a background market-wide scan
+        self.token_discovery = token_discovery
+        self.token_discovery_interval = token_discovery_interval
+        self._token_discovery_task: Optional[asyncio.Task] = None
+        
+        # Discovery mode: pool addresses per DEX, refreshed every `discovery_interval` seconds
+        self.pool_discovery = pool_discovery
+        self.discovery_interval = discovery_interval
+        self.pool_index_file = pool_index_file
+        self.pool_index: Dict[str, List[str]] = {}
+        self._pool_index_times: Dict[str, float] = {}
+        if pool_discovery:
+            self.load_pool_index()
+        
+        # Per-cycle deadline: sources that miss it keep running and are folded into the next cycle
+        self.cycle_deadline = cycle_deadline
+        self._inflight: Dict[str, asyncio.Task] = {}
+        self.source_latency: Dict[str, float] = {}   # seconds the last completed request took
+        self.source_updated: Dict[str, float] = {}   # epoch time the last result arrived
+        self._rate_limited: set = set()               # sources whose last fetch was answered 429
+        
+        # Streaming pipeline state, keyed by integer ids: latest quotes per source (dex id -> token id
+        # -> quote) and derived per-token results (token id -> ...)
+        self.quotes: Dict[int, Dict[int, Tuple[float, float, float]]] = {}
+        self.quote_times: Dict[int, Dict[int, float]] = {}   # dex id -> token id -> epoch time it arrived
+        self.aggregated: Dict[int, Dict] = {}
+        self._unbuilt: set = set()   # valid tokens whose aggregated dict is built on the next read
+        self.opportunities: Dict[int, ArbitrageRoute] = {}
+        # The same quotes as a token x source matrix; merges report which tokens changed,
+        # and only those are re-aggregated
+        self.price_matrix = PriceMatrix(len(self.token_ids))
+        self._route_cache: Dict[int, Tuple[Dict, Optional[ArbitrageRoute]]] = {}
+        # Tokens refreshed by the last partial (adaptive) fetch of a source, by dex id
+        self._partial_refresh: Dict[int, set] = {}
+        self._adaptive_sources: set = set()   # dex ids whose quotes are refreshed per token
+        
+        # Source registry
+        self.sources: Dict[str, PriceSource] = {}
+        self._breakers: Dict[str, CircuitBreaker] = {}
+        self._register_default_sources()
+        
+        # Per-source polling scheduler
+        self._pollers: Dict[str, asyncio.Task] = {}
+        self._updates: asyncio.Queue = asyncio.Queue()
+        
+    def set_tokens(self, tokens: Dict[str, str]):
+        """Replace the tracked token universe, dropping all state for tokens no longer in it"""
+        # A symbol that now names a different mint counts as removed too
+        removed = {self.token_ids.intern(symbol) for symbol, mint in self.tokens.items()
+                   if tokens.get(symbol) != mint}
+        self.tokens = dict(tokens)
+        self._mint_to_symbol = {mint: symbol for symbol, mint in self.tokens.items()}
+        for symbol in self.tokens:
+            self.token_ids.intern(symbol)
+        # Cached list payloads were filtered against the old universe
+        self._http_cache.clear()
+        self._pool_index_times.clear()
+        self._scale_source_budgets()
+        
+        for token in removed:
+            for prices in self.quotes.values():
+                prices.pop(token, None)
+            for arrived in self.quote_times.values():
+                arrived.pop(token, None)
+            self.price_matrix.clear_token(token)
+            self.aggregated.pop(token, None)
+            self._unbuilt.discard(token)
+            self.opportunities.pop(token, None)
+    
+    def _register_default_sources(self):
+        self._builtin_fetchers = {
+            'Jupiter': self.fetch_jupiter_prices,
+            'Raydium': self.fetch_raydium_prices,
+            'Orca': self.fetch_orca_prices,
+            'Birdeye': self.fetch_birdeye_prices,
+            'Meteora': self.fetch_meteora_prices,
+        }
+        for name, fetch in self._builtin_fetchers.items():
+            self.register_source(PriceSource(
+                name=name,
+                fetch=fetch,
+                poll_interval=self._default_poll_interval(name),
+                concurrency=self.per_host_concurrency,
+                urls=SOURCE_URLS[name],
+                rate_limit=RATE_LIMITS.get(name)
+            ))
+        self._scale_source_budgets()
+    
+    def _requests_per_poll(self, name: str) -> int:
+        """Requests a full poll of a built-in source makes for the current tokens and pool index"""
+        if name == 'Jupiter':
+            return len(self._jupiter_chunks())
+        if name == 'Birdeye':
+            mints = list(self.tokens.values())
+            return len(self._birdeye_chunks(mints)) if self.birdeye_batch_size > 0 else len(mints)
+        if name == 'Raydium':
+            return RAYDIUM_LIST_PAGES if len(self.tokens) > RAYDIUM_PER_MINT_LIMIT else len(self.tokens)
+        if self.pool_discovery and self.pool_index.get(name):
+            return len(self.pool_index[name])
+        return 1
+    
+    def _scale_source_budgets(self):
+        """Fit the built-in sources' timeouts and poll intervals to the requests a poll makes at their rate limit"""
+        for name, fetch in self._builtin_fetchers.items():
+            source = self.sources.get(name)
+            if source is None or source.fetch != fetch or not source.rate_limit:
+                continue
+            rate, burst = source.rate_limit
+            requests = self._requests_per_poll(name)
+            # The bucket releases the first `burst` requests at once and the rest at `rate`
+            source.timeout = SOURCE_TIMEOUT + max(0, requests - burst) / rate
+            interval = self._default_poll_interval(name)
+            if not (self.refresh_policy and name in ('Raydium', 'Birdeye')):
+                # Adaptive sources only request the tokens that are due, so their tick stays fast
+                interval = max(interval, requests / rate)
+            source.poll_interval = interval
+    
+    def _default_poll_interval(self, name: str) -> float:
+        # With adaptive polling the per-mint sources tick at the fastest token rate and pick due tokens
+        if self.refresh_policy and name in ('Raydium', 'Birdeye'):
+            return self.refresh_policy.min_interval
+        return SOURCE_POLL_INTERVALS.get(name, UPDATE_INTERVAL)
+    
+    def _tokens_due(self, dex: str, symbols: List[str]) -> List[str]:
+        if not self.refresh_policy:
+            return symbols
+        ids, names = self.token_ids.ids, self.token_ids.names
+        due = self.refresh_policy.due(self.dex_ids.intern(dex), [ids[symbol] for symbol in symbols])
+        return [names[token] for token in due]
+    
+    def _merge_partial(self, dex: str, requested: List[str],
+                       prices: Dict[str, Tuple[float, float, float]]) -> Dict[str, Tuple[float, float, float]]:
+        """Mark a fetch that refreshed only `requested` tokens: _merge_source keeps the source's
+        last quotes for the others"""
+        if not self.refresh_policy:
+            return prices
+        dex_id = self.dex_ids.intern(dex)
+        requested = {self.token_ids.ids[symbol] for symbol in requested}
+        self._partial_refresh[dex_id] = requested
+        # Pools of the tokens not refreshed this time are still current (touched before the commit)
+        self.pools.touch(dex, [token for token in self.quotes.get(dex_id, {}) if token not in requested])
+        return prices
+    
+    def register_source(self, source: PriceSource):
+        """Add (or replace) a price source; the fetch cycle runs every registered source"""
+        self.sources[source.name] = source
+        self._breakers[source.name] = CircuitBreaker()
+        for url in source.urls:
+            host = urlparse(url).netloc
+            self._host_semaphores[host] = asyncio.Semaphore(source.concurrency)
+            if source.rate_limit:
+                self._rate_limiters[host] = TokenBucket(*source.rate_limit)
+    
+    def unregister_source(self, name: str):
+        """Remove a source; an outstanding request for it is cancelled"""
+        self.sources.pop(name, None)
+        self._breakers.pop(name, None)
+        self._reevaluate(self._drop_source(self.dex_ids.intern(name)))
+        for tasks in (self._inflight, self._pollers):
+            task = tasks.pop(name, None)
+            if task:
+                task.cancel()
+    
     async def __aenter__(self):
         timeout = aiohttp.ClientTimeout(total=10, connect=5)
-        connector = aiohttp.TCPConnector(ssl=ssl_context, limit=20)
+        connector = aiohttp.TCPConnector(ssl=ssl_context, limit=MAX_IN_FLIGHT_REQUESTS)
         self.session = aiohttp.ClientSession(timeout=timeout, connector=connector)
+        
+        if self.token_discovery:
+            # The first scan runs before any polling so the hot loop starts on the discovered set
+            await self.refresh_token_universe()
+            self._token_discovery_task = asyncio.create_task(self._token_discovery_loop())
         return self
     
     async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.stop_scheduler()
+        
+        if self._token_discovery_task:
+            self._token_discovery_task.cancel()
+            await asyncio.gather(self._token_discovery_task, return_exceptions=True)
+            self._token_discovery_task = None
+        
+        for task in self._inflight.values():
+            task.cancel()
+        if self._inflight:
+            await asyncio.gather(*self._inflight.values(), return_exceptions=True)
+        self._inflight.clear()
+        
         if self.session:
             await self.session.close()
     
-    async def fetch_jupiter_prices(self) -> Dict[str, Tuple[float, float, float]]:
-        """Fetch prices from Jupiter - returns (price, liquidity, volume)"""
+    def _host_semaphore(self, url: str) -> asyncio.Semaphore:
+        """Semaphore bounding concurrent requests to the host of `url`"""
+        host = urlparse(url).netloc
+        semaphore = self._host_semaphores.get(host)
+        if semaphore is None:
+            semaphore = asyncio.Semaphore(self.per_host_concurrency)
+            self._host_semaphores[host] = semaphore
+        return semaphore
+    
+    async def _get_json(self, url: str, cache: bool = False,
+                        parse: Optional[Callable[[aiohttp.ClientResponse], Awaitable]] = None):
+        """GET `url` and return the decoded JSON body, or None on a non-200 response (5xx raises,
+        and a 429 that outlasts the retries raises RateLimitedError).
+        
+        With `cache=True` the ETag/Last-Modified validators and decoded payload are kept per URL,
+        and a 304 Not Modified returns the previously decoded payload without reading the body.
+        `parse` replaces `response.json()` as the decoder (e.g. a streaming, filtering parser).
+        With a hedge policy, a request still unanswered after the host's p95 latency is duplicated
+        and the first successful answer wins. The hedge timer starts when the request is sent,
+        not while it queues for a request slot or rate-limit token.
+        """
+        if self.hedge_policy is None:
+            return await self._request_json(url, cache, parse)
+        
+        policy = self.hedge_policy
+        host = urlparse(url).netloc
+        policy.requests[host] += 1
+        
+        sent = asyncio.Event()
+        tasks = [asyncio.ensure_future(self._request_json(url, cache, parse, sent))]
         try:
-            token_ids = ','.join(TOKENS.values())
-            url = f"{JUPITER_PRICE_URL}?ids={token_ids}"
+            delay = policy.hedge_delay(host)
+            if delay is not None:
+                sending = asyncio.ensure_future(sent.wait())
+                await asyncio.wait([tasks[0], sending], return_when=asyncio.FIRST_COMPLETED)
+                sending.cancel()
+                if not tasks[0].done():
+                    await asyncio.wait(tasks, timeout=delay)
+                    if not tasks[0].done() and policy.try_hedge(host):
+                        tasks.append(asyncio.ensure_future(self._request_json(url, cache, parse)))
             
-            async with self.session.get(url) as response:
-                if response.status == 200:
-                    data = await response.json()
-                    prices = {}
-                    
-                    if 'data' in data:
-                        for symbol, mint in TOKENS.items():
-                            if mint in data['data']:
-                                token_data = data['data'][mint]
-                                price = float(token_data.get('price', 0))
-                                liquidity = float(token_data.get('liquidity', 0))
-                                volume = float(token_data.get('volume24h', 0))
-                                
-                                if price > 0:
-                                    prices[symbol] = (price, liquidity, volume)
+            return await self._first_success(tasks)
+        finally:
+            for task in tasks:
+                task.cancel()
+    
+    @staticmethod
+    async def _gather_requests(requests) -> List:
+        """Run requests concurrently; failed ones come back as None, and if every one failed the first error is raised.
+        
+        A rate-limited request is always raised: a partial answer would drop the throttled tokens' quotes.
+        """
+        results = await asyncio.gather(*requests, return_exceptions=True)
+        errors = [r for r in results if isinstance(r, Exception)]
+        for error in errors:
+            if isinstance(error, RateLimitedError):
+                raise error
+        if errors and len(errors) == len(results):
+            raise errors[0]
+        return [None if isinstance(r, Exception) else r for r in results]
+    
+    @staticmethod
+    async def _first_success(tasks: List[asyncio.Future]):
+        """Result of the first task to succeed; raises the last error if all of them fail"""
+        pending = set(tasks)
+        error = None
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    return task.result()
+                error = task.exception()
+        raise error
+    
+    async def _request_json(self, url: str, cache: bool,
+                            parse: Optional[Callable[[aiohttp.ClientResponse], Awaitable]],
+                            sent: Optional[asyncio.Event] = None):
+        """Single GET behind _get_json: global/per-host limits and token bucket, conditional headers, 429 retries.
+        
+        `sent` is set once the request has its slot and token and goes out. With a hedge policy the
+        host latency is recorded from that point, so queueing does not count as server latency.
+        """
+        entry = self._http_cache.get(url) if cache else None
+        headers = {}
+        if entry:
+            if entry.etag:
+                headers['If-None-Match'] = entry.etag
+            if entry.last_modified:
+                headers['If-Modified-Since'] = entry.last_modified
+        
+        host = urlparse(url).netloc
+        limiter = self._rate_limiters.get(host)
+        
+        for attempt in range(RATE_LIMIT_RETRIES + 1):
+            if limiter:
+                # A host paused by an earlier 429 is not waited on past the source timeout
+                if limiter.blocked_for() > RATE_LIMIT_MAX_WAIT:
+                    raise RateLimitedError(host, limiter.blocked_for())
+                # Wait for the token before taking a slot, so a slow bucket cannot park shared slots
+                await limiter.acquire()
+            async with self._request_slots, self._host_semaphore(url):
+                if sent:
+                    sent.set()
+                started = time.perf_counter()
+                async with self.session.get(url, headers=headers) as response:
+                    if limiter:
+                        limiter.update_from_headers(response.headers)
+                    if response.status != 429:
+                        payload = await self._decode_response(url, response, entry, cache, parse)
+                        if self.hedge_policy:
+                            self.hedge_policy.record(host, time.perf_counter() - started)
+                        return payload
                     
-                    return prices
+                    wait = retry_after_seconds(response.headers.get('Retry-After'))
+                    if limiter:
+                        limiter.pause(wait)
+            
+            print(f"  ⏳ {host}: rate limited (429), retry after {wait:.1f}s")
+            if wait > RATE_LIMIT_MAX_WAIT or attempt == RATE_LIMIT_RETRIES:
+                raise RateLimitedError(host, wait)
+            if not limiter:
+                await asyncio.sleep(wait)
+    
+    async def _decode_response(self, url: str, response: aiohttp.ClientResponse,
+                               entry: Optional[HTTPCacheEntry], cache: bool,
+                               parse: Optional[Callable[[aiohttp.ClientResponse], Awaitable]]):
+        """Turn a (non-429) response into the decoded payload, updating the conditional-GET cache"""
+        if response.status == 304 and entry:
+            return entry.payload
+        if response.status >= 500:
+            # Server-side failures count against the source's circuit breaker
+            response.raise_for_status()
+        if response.status != 200:
+            return None
+        
+        payload = await (parse(response) if parse else response.json())
+        
+        if cache:
+            etag = response.headers.get('ETag')
+            last_modified = response.headers.get('Last-Modified')
+            if etag or last_modified:
+                self._http_cache[url] = HTTPCacheEntry(etag, last_modified, payload)
+        return payload
+    
+    @staticmethod
+    async def _stream_json_array(response: aiohttp.ClientResponse, key: Optional[str],
+                                 keep: Callable[[Dict], bool]) -> List[Dict]:
+        """Stream-decode a JSON array body, keeping only the elements `keep` accepts"""
+        items = iter_json_array(response.content.iter_chunked(STREAM_CHUNK_SIZE), key)
+        return [item async for item in items if keep(item)]
+    
+    def _classify_pool(self, mint_a: Optional[str], mint_b: Optional[str]) -> Optional[Tuple[str, bool]]:
+        """Return (symbol, inverted) for a tracked-token/quote pool, or None if the pool is irrelevant.
+        
+        `inverted` is True when the quote mint is token A, i.e. the pool price must be inverted.
+        """
+        if mint_b in self._quote_mints:
+            symbol = self._mint_to_symbol.get(mint_a)
+            return (symbol, False) if symbol else None
+        if mint_a in self._quote_mints:
+            symbol = self._mint_to_symbol.get(mint_b)
+            return (symbol, True) if symbol else None
+        return None
+    
+    def _is_relevant_orca_pool(self, pool: Dict) -> bool:
+        return (float(pool.get('tvl', 0)) >= MIN_LIQUIDITY_USD and
+                self._classify_pool(pool.get('tokenA', {}).get('mint'),
+                                    pool.get('tokenB', {}).get('mint')) is not None)
+    
+    def _is_relevant_meteora_pair(self, pair: Dict) -> bool:
+        return (float(pair.get('liquidity', 0)) >= MIN_LIQUIDITY_USD and
+                self._classify_pool(pair.get('mint_x'), pair.get('mint_y')) is not None)
+    
+    def load_pool_index(self):
+        """Load a persisted pool index, ignoring it if it was built for a different token set"""
+        if not self.pool_index_file or not os.path.exists(self.pool_index_file):
+            return
+        
+        try:
+            with open(self.pool_index_file) as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"✗ Pool index {self.pool_index_file}: {e}")
+            return
+        
+        if set(data.get('tokens', [])) != set(self.tokens.values()):
+            return
+        
+        for dex, entry in data.get('sources', {}).items():
+            self.pool_index[dex] = entry['pools']
+            self._pool_index_times[dex] = entry['discovered_at']
+    
+    def save_pool_index(self):
+        """Persist the pool index so a restart can skip the first discovery pass"""
+        if not self.pool_index_file:
+            return
+        
+        data = {
+            'timestamp': datetime.now().isoformat(),
+            'tokens': list(self.tokens.values()),
+            'sources': {
+                dex: {'discovered_at': self._pool_index_times[dex], 'pools': pools}
+                for dex, pools in self.pool_index.items()
+            }
+        }
+        
+        with open(self.pool_index_file, 'w') as f:
+            json.dump(data, f, indent=2)
+    
+    def _discovery_due(self, dex: str) -> bool:
+        discovered_at = self._pool_index_times.get(dex)
+        return discovered_at is None or time.time() - discovered_at >= self.discovery_interval
+    
+    def _record_discovery(self, dex: str, addresses: List[str]):
+        self.pool_index[dex] = addresses
+        self._pool_index_times[dex] = time.time()
+        self.save_pool_index()
+        self._scale_source_budgets()
+        print(f"✓ {dex}: discovered {len(addresses)} tracked pools")
+    
+    async def _fetch_pool_details(self, base_url: str, addresses: List[str]) -> List[Dict]:
+        """Fetch `{base_url}/{address}` for each indexed pool concurrently"""
+        results = await self._gather_requests(self._get_json(f"{base_url}/{address}") for address in addresses)
+        return [r for r in results if r]
+    
+    def _listed_base(self, dex: str, pool: Dict) -> Optional[Tuple[str, Optional[str]]]:
+        """(mint, symbol) of the non-USDC side of a liquid USDC pool in a DEX pool list, or None"""
+        if dex == 'Orca':
+            side_a, side_b = pool.get('tokenA') or {}, pool.get('tokenB') or {}
+            mint_a, mint_b = side_a.get('mint'), side_b.get('mint')
+            symbol_a, symbol_b = side_a.get('symbol'), side_b.get('symbol')
+            liquidity = pool.get('tvl', 0)
+        elif dex == 'Meteora':
+            mint_a, mint_b = pool.get('mint_x'), pool.get('mint_y')
+            names = (pool.get('name') or '').split('-')
+            symbol_a, symbol_b = names if len(names) == 2 else (None, None)
+            liquidity = pool.get('liquidity', 0)
+        else:
+            side_a, side_b = pool.get('mintA') or {}, pool.get('mintB') or {}
+            mint_a, mint_b = side_a.get('address'), side_b.get('address')
+            symbol_a, symbol_b = side_a.get('symbol'), side_b.get('symbol')
+            liquidity = pool.get('tvl', 0)
+        
+        if float(liquidity or 0) < MIN_LIQUIDITY_USD:
+            return None
+        if mint_b in self._quote_mints and mint_a and mint_a not in self._quote_mints:
+            return mint_a, symbol_a
+        if mint_a in self._quote_mints and mint_b and mint_b not in self._quote_mints:
+            return mint_b, symbol_b
+        return None
+    
+    async def discover_tokens(self) -> Dict[str, str]:
+        """Scan the Orca, Meteora and Raydium pool lists for a market-wide token universe.
+        
+        A mint qualifies when at least MIN_SOURCES of these DEXes list a USDC pool for it above
+        MIN_LIQUIDITY_USD, i.e. when it can pass the aggregation filters at all. Mints already
+        tracked keep their symbols.
+        """
+        # Not cached: the price fetchers cache these URLs with a different filter
+        listings = dict(zip(('Orca', 'Meteora', 'Raydium'), await asyncio.gather(
+            self._get_json(ORCA_WHIRLPOOL_URL, parse=lambda r: self._stream_json_array(
+                r, 'whirlpools', lambda pool: self._listed_base('Orca', pool) is not None)),
+            self._get_json(METEORA_URL, parse=lambda r: self._stream_json_array(
+                r, None, lambda pair: self._listed_base('Meteora', pair) is not None)),
+            self._fetch_raydium_list_pages(),
+            return_exceptions=True
+        )))
+        
+        # A partial scan would drop every token listed on the missing DEX
+        for dex, pools in listings.items():
+            if isinstance(pools, Exception):
+                raise pools
+            if pools is None:
+                raise RuntimeError(f"{dex} pool list unavailable")
+        
+        dexes_by_mint: Dict[str, set] = defaultdict(set)
+        symbols: Dict[str, Optional[str]] = {}
+        for dex, pools in listings.items():
+            for pool in pools:
+                listed = self._listed_base(dex, pool)
+                if listed:
+                    mint, symbol = listed
+                    dexes_by_mint[mint].add(dex)
+                    symbols.setdefault(mint, symbol)
+        
+        qualifying = {mint for mint, dexes in dexes_by_mint.items() if len(dexes) >= MIN_SOURCES}
+        entries = [(symbol, mint) for symbol, mint in self.tokens.items() if mint in qualifying]
+        entries += [(symbols[mint], mint) for mint in qualifying if mint not in self._mint_to_symbol]
+        return build_token_map(entries)
+    
+    async def refresh_token_universe(self):
+        """Run one discovery scan and switch to its token set; on failure the current set is kept"""
+        try:
+            tokens = await self.discover_tokens()
         except Exception as e:
-            print(f"✗ Jupiter: {e}")
-        return {}
+            print(f"✗ Token discovery: {str(e) or type(e).__name__}")
+            return
+        
+        self.set_tokens(tokens)
+        print(f"✓ Token discovery: tracking {len(tokens)} tokens")
+    
+    async def _token_discovery_loop(self):
+        while True:
+            await asyncio.sleep(self.token_discovery_interval)
+            await self.refresh_token_universe()
+    
+    # Source fetchers raise on failure; _timed_fetch reports the error and feeds the circuit breaker
+    
+    def _jupiter_chunks(self) -> List[List[str]]:
+        return chunk_query_values(f"{JUPITER_PRICE_URL}?ids=", list(self.tokens.values()), JUPITER_BATCH_SIZE)
+    
+    async def fetch_jupiter_prices(self) -> Dict[str, Tuple[float, float, float]]:
+        """Fetch prices from Jupiter - returns (price, liquidity, volume)"""
+        results = await self._gather_requests(
+            self._get_json(f"{JUPITER_PRICE_URL}?ids={','.join(chunk)}") for chunk in self._jupiter_chunks()
+        )
+        
+        quotes = {}
+        for data in results:
+            if data and data.get('data'):
+                quotes.update(data['data'])
+        
+        prices = {}
+        for symbol, mint in self.tokens.items():
+            token_data = quotes.get(mint)
+            if token_data:
+                price = float(token_data.get('price', 0))
+                liquidity = float(token_data.get('liquidity', 0))
+                volume = float(token_data.get('volume24h', 0))
+                
+                if price > 0:
+                    prices[symbol] = (price, liquidity, volume)
+        
+        return prices
+    
+    async def _fetch_raydium_pool(self, symbol: str, mint: str) -> Optional[Tuple[float, float, float]]:
+        """Fetch the Raydium USDC pools for a single mint; the deepest one prices the token"""
+        url = f"{RAYDIUM_URL}?mint1={mint}&mint2={USDC_MINT}&poolType=all&poolSortField=liquidity&sortType=desc"
+        
+        data = await self._get_json(url)
+        # The token may have been removed (or remapped) by set_tokens while the request was out
+        if not data or not data.get('data') or self.tokens.get(symbol) != mint:
+            return None
+        
+        # Pools arrive sorted by liquidity; every qualifying one is kept for routing
+        best = None
+        for pool in data['data']:
+            price = float(pool.get('price', 0))
+            tvl = float(pool.get('tvl', 0))
+            volume = float(pool.get('volume24h', 0))
+            
+            if price <= 0 or tvl < MIN_LIQUIDITY_USD:
+                continue
+            
+            self.pools.stage(PoolData(
+                dex='Raydium',
+                token_a=symbol,
+                token_b='USDC',
+                price=price,
+                liquidity_usd=tvl,
+                volume_24h=volume,
+                fee_rate=float(pool.get('feeRate', 0.0025)),
+                pool_address=pool.get('id', '')
+            ))
+            if best is None or tvl > best[1]:
+                best = (price, tvl, volume)
+        
+        return best
+    
+    def parse_raydium_pools(self, pools: List[Dict]) -> Dict[str, Tuple[float, float, float]]:
+        """Pick the deepest USDC pool per tracked token from a page of the Raydium pool list"""
+        prices = {}
+        
+        for pool in pools:
+            tvl = float(pool.get('tvl', 0))
+            if tvl < MIN_LIQUIDITY_USD:
+                continue
+            
+            match = self._classify_pool((pool.get('mintA') or {}).get('address'),
+                                        (pool.get('mintB') or {}).get('address'))
+            if match is None:
+                continue
+            symbol, inverted = match
+            
+            raw_price = float(pool.get('price', 0))
+            if raw_price <= 0:
+                continue
+            price = 1.0 / raw_price if inverted else raw_price
+            
+            volume = float((pool.get('day') or {}).get('volume', 0))
+            self.pools.stage(PoolData(
+                dex='Raydium',
+                token_a=symbol,
+                token_b='USDC',
+                price=price,
+                liquidity_usd=tvl,
+                volume_24h=volume,
+                fee_rate=float(pool.get('feeRate', 0.0025)),
+                pool_address=pool.get('id', '')
+            ))
+            
+            if symbol not in prices or tvl > prices[symbol][1]:
+                prices[symbol] = (price, tvl, volume)
+        
+        return prices
+    
+    async def _fetch_raydium_list_pages(self) -> List[Dict]:
+        """Fetch the first RAYDIUM_LIST_PAGES pages of Raydium's liquidity-sorted pool list"""
+        urls = [
+            f"{RAYDIUM_POOL_LIST_URL}?poolType=all&poolSortField=liquidity&sortType=desc"
+            f"&pageSize={RAYDIUM_LIST_PAGE_SIZE}&page={page}"
+            for page in range(1, RAYDIUM_LIST_PAGES + 1)
+        ]
+        results = await self._gather_requests(self._get_json(url) for url in urls)
+        
+        pools = []
+        for data in results:
+            if data and data.get('data'):
+                pools.extend(data['data'].get('data', []))
+        return pools
+    
+    async def _fetch_raydium_pool_list(self) -> Dict[str, Tuple[float, float, float]]:
+        """Scan the deepest pools on Raydium in a few pages instead of one request per mint"""
+        prices = self.parse_raydium_pools(await self._fetch_raydium_list_pages())
+        for symbol in ('USDC', 'USDT'):
+            if symbol in self.tokens:
+                prices[symbol] = (1.0, 0, 0)
+        return prices
     
     async def fetch_raydium_prices(self) -> Dict[str, Tuple[float, float, float]]:
-        """Fetch prices from Raydium with liquidity data"""
-        try:
-            prices = {}
+        """Fetch prices from Raydium with liquidity data (one request per mint, issued concurrently)"""
+        if len(self.tokens) > RAYDIUM_PER_MINT_LIMIT:
+            return await self._fetch_raydium_pool_list()
+        
+        stablecoins = ['USDC', 'USDT']
+        symbols = self._tokens_due('Raydium', [symbol for symbol in self.tokens if symbol not in stablecoins])
+        mint_of = {symbol: self.tokens[symbol] for symbol in symbols}
+        results = await self._gather_requests(
+            self._fetch_raydium_pool(symbol, mint) for symbol, mint in mint_of.items()
+        )
+        by_symbol = dict(zip(symbols, results))
+        
+        # Merge in token order so output does not depend on response order
+        prices = {}
+        for symbol in self.tokens:
+            if symbol in stablecoins:
+                prices[symbol] = (1.0, 0, 0)
+                continue
             
-            for symbol, mint in TOKENS.items():
-                if symbol in ['USDC', 'USDT']:
-                    prices[symbol] = (1.0, 0, 0)
-                    continue
-                
-                url = f"{RAYDIUM_URL}?mint1={mint}&mint2={USDC_MINT}&poolType=all&poolSortField=liquidity&sortType=desc"
-                
-                async with self.session.get(url) as response:
-                    if response.status == 200:
-                        data = await response.json()
-                        if data.get('data') and len(data['data']) > 0:
-                            # Get pool with highest liquidity
-                            pool = data['data'][0]
-                            price = float(pool.get('price', 0))
-                            tvl = float(pool.get('tvl', 0))
-                            volume = float(pool.get('volume24h', 0))
-                            
-                            if price > 0 and tvl >= MIN_LIQUIDITY_USD:
-                                prices[symbol] = (price, tvl, volume)
-                                
-                                # Store pool data for GPU routing
-                                self.pools.append(PoolData(
-                                    dex='Raydium',
-                                    token_a=symbol,
-                                    token_b='USDC',
-                                    price=price,
-                                    liquidity_usd=tvl,
-                                    volume_24h=volume,
-                                    fee_rate=float(pool.get('feeRate', 0.0025)),
-                                    pool_address=pool.get('id', '')
-                                ))
+            result = by_symbol.get(symbol)
+            if result is None:
+                continue
             
-            return prices
-        except Exception as e:
-            print(f"✗ Raydium: {e}")
-        return {}
+            prices[symbol] = result
+        
+        return self._merge_partial('Raydium', symbols, prices)
+    
+    def parse_orca_pools(self, whirlpools: List[Dict]) -> Dict[str, Tuple[float, float, float]]:
+        """Pick the deepest USDC whirlpool per tracked token from an Orca whirlpool list"""
+        prices = {}
+        
+        for pool in whirlpools:
+            tvl = float(pool.get('tvl', 0))
+            
+            # Only use pools with sufficient liquidity
+            if tvl < MIN_LIQUIDITY_USD:
+                continue
+            
+            match = self._classify_pool(pool.get('tokenA', {}).get('mint'), pool.get('tokenB', {}).get('mint'))
+            if match is None:
+                continue
+            symbol, inverted = match
+            
+            raw_price = float(pool.get('price', 0))
+            if raw_price <= 0:
+                continue
+            price = 1.0 / raw_price if inverted else raw_price
+            
+            # Every qualifying pool is kept for routing; the deepest one prices the token
+            volume = float(pool.get('volume', {}).get('day', 0))
+            self.pools.stage(PoolData(
+                dex='Orca',
+                token_a=symbol,
+                token_b='USDC',
+                price=price,
+                liquidity_usd=tvl,
+                volume_24h=volume,
+                fee_rate=0.003,
+                pool_address=pool.get('address', '')
+            ))
+            
+            if symbol not in prices or tvl > prices[symbol][1]:
+                prices[symbol] = (price, tvl, volume)
+        
+        return prices
+    
+    @staticmethod
+    def _orca_v2_pool_to_v1(pool: Dict) -> Dict:
+        """Map a v2 single-pool response onto the v1 whirlpool/list shape parse_orca_pools expects"""
+        return {
+            'address': pool.get('address', ''),
+            'tokenA': {'mint': pool.get('tokenMintA')},
+            'tokenB': {'mint': pool.get('tokenMintB')},
+            'price': pool.get('price', 0),
+            'tvl': pool.get('tvlUsdc', 0),
+            'volume': {'day': (pool.get('stats') or {}).get('24h', {}).get('volume', 0)},
+        }
     
     async def fetch_orca_prices(self) -> Dict[str, Tuple[float, float, float]]:
-        """Fetch prices from Orca Whirlpools"""
+        """Fetch prices from Orca Whirlpools (full list, or indexed pools only in discovery mode)"""
+        if self.pool_discovery and not self._discovery_due('Orca'):
+            details = await self._fetch_pool_details(ORCA_POOL_URL, self.pool_index['Orca'])
+            return self.parse_orca_pools([self._orca_v2_pool_to_v1(d.get('data', d)) for d in details])
+        
+        # Untracked and illiquid pools are dropped while the list streams in
+        whirlpools = await self._get_json(
+            ORCA_WHIRLPOOL_URL, cache=True,
+            parse=lambda r: self._stream_json_array(r, 'whirlpools', self._is_relevant_orca_pool)
+        )
+        if whirlpools is not None:
+            if self.pool_discovery:
+                self._record_discovery('Orca', [p.get('address', '') for p in whirlpools])
+            return self.parse_orca_pools(whirlpools)
+        return {}
+    
+    @staticmethod
+    def _parse_birdeye_quote(quote: Optional[Dict]) -> Optional[Tuple[float, float, float]]:
+        """Turn a Birdeye price object into (price, liquidity, volume), or None if unusable"""
+        if not quote or not quote.get('value'):
+            return None
+        
+        price = float(quote['value'])
+        liquidity = float(quote.get('liquidity', 0))
+        volume = float(quote.get('v24hUSD', 0))
+        
+        if price > 0 and liquidity >= MIN_LIQUIDITY_USD:
+            return price, liquidity, volume
+        return None
+    
+    async def _fetch_birdeye_single(self, mint: str) -> Optional[Tuple[float, float, float]]:
+        """Fetch one mint from the single-price endpoint"""
+        url = f"{BIRDEYE_URL}?address={mint}"
+        
+        data = await self._get_json(url)
+        if not data:
+            return None
+        return self._parse_birdeye_quote(data.get('data'))
+    
+    def _birdeye_chunks(self, mints: List[str]) -> List[List[str]]:
+        prefix = f"{BIRDEYE_MULTI_PRICE_URL}?include_liquidity=true&list_address="
+        return chunk_query_values(prefix, mints, self.birdeye_batch_size)
+    
+    async def _fetch_birdeye_batch(self, mints: List[str]) -> Dict[str, Optional[Tuple[float, float, float]]]:
+        """Fetch a chunk of mints from the multi_price endpoint, falling back to per-mint calls if it fails (not on 429)"""
+        url = f"{BIRDEYE_MULTI_PRICE_URL}?include_liquidity=true&list_address={','.join(mints)}"
+        
         try:
-            async with self.session.get(ORCA_WHIRLPOOL_URL) as response:
-                if response.status == 200:
-                    data = await response.json()
-                    prices = {}
-                    
-                    if 'whirlpools' in data:
-                        for pool in data['whirlpools']:
-                            token_a = pool.get('tokenA', {}).get('mint')
-                            token_b = pool.get('tokenB', {}).get('mint')
-                            tvl = float(pool.get('tvl', 0))
-                            volume = float(pool.get('volume', {}).get('day', 0))
-                            
-                            # Only use pools with sufficient liquidity
-                            if tvl < MIN_LIQUIDITY_USD:
-                                continue
-                            
-                            for symbol, mint in TOKENS.items():
-                                if mint == token_a and token_b == USDC_MINT:
-                                    price = float(pool.get('price', 0))
-                                    if price > 0:
-                                        if symbol not in prices or tvl > prices[symbol][1]:
-                                            prices[symbol] = (price, tvl, volume)
-                                            
-                                            self.pools.append(PoolData(
-                                                dex='Orca',
-                                                token_a=symbol,
-                                                token_b='USDC',
-                                                price=price,
-                                                liquidity_usd=tvl,
-                                                volume_24h=volume,
-                                                fee_rate=0.003,
-                                                pool_address=pool.get('address', '')
-                                            ))
-                                
-                                elif mint == token_b and token_a == USDC_MINT:
-                                    price = 1.0 / float(pool.get('price', 1))
-                                    if price > 0:
-                                        if symbol not in prices or tvl > prices[symbol][1]:
-                                            prices[symbol] = (price, tvl, volume)
-                                            
-                                            self.pools.append(PoolData(
-                                                dex='Orca',
-                                                token_a=symbol,
-                                                token_b='USDC',
-                                                price=price,
-                                                liquidity_usd=tvl,
-                                                volume_24h=volume,
-                                                fee_rate=0.003,
-                                                pool_address=pool.get('address', '')
-                                            ))
-                    
-                    return prices
+            data = await self._get_json(url)
+            if data and isinstance(data.get('data'), dict):
+                return {mint: self._parse_birdeye_quote(data['data'].get(mint)) for mint in mints}
+        except RateLimitedError:
+            # Per-mint requests would go to the same throttled host
+            raise
         except Exception as e:
-            print(f"✗ Orca: {e}")
-        return {}
+            print(f"✗ Birdeye multi_price ({len(mints)} mints), falling back to single requests: {e}")
+        
+        return await self._fetch_birdeye_singles(mints)
+    
+    async def _fetch_birdeye_singles(self, mints: List[str]) -> Dict[str, Optional[Tuple[float, float, float]]]:
+        """Fetch mints one request each from the single-price endpoint"""
+        results = await self._gather_requests(self._fetch_birdeye_single(mint) for mint in mints)
+        return dict(zip(mints, results))
     
     async def fetch_birdeye_prices(self) -> Dict[str, Tuple[float, float, float]]:
-        """Fetch prices from Birdeye"""
-        try:
-            prices = {}
+        """Fetch prices from Birdeye (batched multi_price chunks, or one request per mint)"""
+        symbols = self._tokens_due('Birdeye', list(self.tokens))
+        # set_tokens may run during the fetch; only this map is used after the awaits
+        mint_of = {symbol: self.tokens[symbol] for symbol in symbols}
+        mints = list(mint_of.values())
+        
+        if self.birdeye_batch_size > 0:
+            chunks = await self._gather_requests(
+                self._fetch_birdeye_batch(chunk) for chunk in self._birdeye_chunks(mints)
+            )
+            quotes = {mint: quote for chunk in chunks if chunk for mint, quote in chunk.items()}
+        else:
+            quotes = await self._fetch_birdeye_singles(mints)
+        
+        prices = {}
+        for symbol, mint in mint_of.items():
+            quote = quotes.get(mint)
+            # Tokens removed (or remapped) while the request was out are dropped
+            if quote and self.tokens.get(symbol) == mint:
+                prices[symbol] = quote
+        
+        return self._merge_partial('Birdeye', symbols, prices)
+    
+    def parse_meteora_pairs(self, pairs: List[Dict]) -> Dict[str, Tuple[float, float, float]]:
+        """Pick the deepest USDC DLMM pair per tracked token from a Meteora pair list"""
+        prices = {}
+        
+        for pair in pairs:
+            tvl = float(pair.get('liquidity', 0))
             
-            for symbol, mint in TOKENS.items():
-                url = f"{BIRDEYE_URL}?address={mint}"
-                
-                async with self.session.get(url) as response:
-                    if response.status == 200:
-                        data = await response.json()
-                        if data.get('data', {}).get('value'):
-                            price = float(data['data']['value'])
-                            liquidity = float(data['data'].get('liquidity', 0))
-                            volume = float(data['data'].get('v24hUSD', 0))
-                            
-                            if price > 0 and liquidity >= MIN_LIQUIDITY_USD:
-                                prices[symbol] = (price, liquidity, volume)
+            # Filter by liquidity
+            if tvl < MIN_LIQUIDITY_USD:
+                continue
             
-            return prices
-        except Exception as e:
-            print(f"✗ Birdeye: {e}")
-        return {}
+            match = self._classify_pool(pair.get('mint_x'), pair.get('mint_y'))
+            if match is None:
+                continue
+            symbol, inverted = match
+            
+            raw_price = float(pair.get('current_price', 0))
+            if raw_price <= 0:
+                continue
+            price = 1.0 / raw_price if inverted else raw_price
+            
+            # Every qualifying pair is kept for routing; the deepest one prices the token
+            volume = float(pair.get('trade_volume_24h', 0))
+            self.pools.stage(PoolData(
+                dex='Meteora',
+                token_a=symbol,
+                token_b='USDC',
+                price=price,
+                liquidity_usd=tvl,
+                volume_24h=volume,
+                fee_rate=float(pair.get('fee_rate', 0.003)),
+                pool_address=pair.get('address', '')
+            ))
+            
+            if symbol not in prices or tvl > prices[symbol][1]:
+                prices[symbol] = (price, tvl, volume)
+        
+        return prices
     
     async def fetch_meteora_prices(self) -> Dict[str, Tuple[float, float, float]]:
-        """Fetch prices from Meteora DLMM"""
+        """Fetch prices from Meteora DLMM (full list, or indexed pairs only in discovery mode)"""
+        if self.pool_discovery and not self._discovery_due('Meteora'):
+            pairs = await self._fetch_pool_details(METEORA_PAIR_URL, self.pool_index['Meteora'])
+            return self.parse_meteora_pairs(pairs)
+        
+        # Untracked and illiquid pairs are dropped while the list streams in
+        pairs = await self._get_json(
+            METEORA_URL, cache=True,
+            parse=lambda r: self._stream_json_array(r, None, self._is_relevant_meteora_pair)
+        )
+        if pairs is not None:
+            if self.pool_discovery:
+                self._record_discovery('Meteora', [p.get('address', '') for p in pairs])
+            return self.parse_meteora_pairs(pairs)
+        return {}
+    
+    async def _timed_fetch(self, dex: str) -> Dict[str, Tuple[float, float, float]]:
+        """Run one source fetch, record its latency and arrival time and feed its circuit breaker"""
+        source = self.sources[dex]
+        breaker = self._breakers[dex]
+        started = time.perf_counter()
+        self.pools.discard(dex)
         try:
-            async with self.session.get(METEORA_URL) as response:
-                if response.status == 200:
-                    data = await response.json()
-                    prices = {}
-                    
-                    for pair in data:
-                        mint_x = pair.get('mint_x')
-                        mint_y = pair.get('mint_y')
-                        tvl = float(pair.get('liquidity', 0))
-                        volume = float(pair.get('trade_volume_24h', 0))
-                        
-                        # Filter by liquidity
-                        if tvl < MIN_LIQUIDITY_USD:
-                            continue
-                        
-                        for symbol, mint in TOKENS.items():
-                            if mint == mint_x and mint_y == USDC_MINT:
-                                price = float(pair.get('current_price', 0))
-                                if price > 0:
-                                    if symbol not in prices or tvl > prices[symbol][1]:
-                                        prices[symbol] = (price, tvl, volume)
-                                        
-                                        self.pools.append(PoolData(
-                                            dex='Meteora',
-                                            token_a=symbol,
-                                            token_b='USDC',
-                                            price=price,
-                                            liquidity_usd=tvl,
-                                            volume_24h=volume,
-                                            fee_rate=float(pair.get('fee_rate', 0.003)),
-                                            pool_address=pair.get('address', '')
-                                        ))
-                            
-                            elif mint == mint_y and mint_x == USDC_MINT:
-                                price = 1.0 / float(pair.get('current_price', 1))
-                                if price > 0:
-                                    if symbol not in prices or tvl > prices[symbol][1]:
-                                        prices[symbol] = (price, tvl, volume)
-                                        
-                                        self.pools.append(PoolData(
-                                            dex='Meteora',
-                                            token_a=symbol,
-                                            token_b='USDC',
-                                            price=price,
-                                            liquidity_usd=tvl,
-                                            volume_24h=volume,
-                                            fee_rate=float(pair.get('fee_rate', 0.003)),
-                                            pool_address=pair.get('address', '')
-                                        ))
-                    
-                    return prices
+            result = await asyncio.wait_for(source.fetch(), timeout=source.timeout)
+        except RateLimitedError as e:
+            # Throttled, not broken: nothing is merged or committed and the last quotes stay until they expire
+            self.pools.discard(dex)
+            self._rate_limited.add(dex)
+            breaker.record_rate_limited(e.retry_after)
+            print(f"  ⏳ {dex}: {e}, keeping its last quotes")
+            raise
         except Exception as e:
-            print(f"✗ Meteora: {e}")
-        return {}
+            self.pools.discard(dex)
+            self._rate_limited.discard(dex)
+            breaker.record_failure(e)
+            print(f"✗ {dex}: {str(e) or type(e).__name__}")
+            if breaker.state == CircuitBreaker.OPEN:
+                print(f"  ⚡ {dex} circuit open, next probe in {breaker.to_dict()['retry_in']:.0f}s")
+            raise
+        
+        breaker.record_success()
+        self._rate_limited.discard(dex)
+        self.pools.commit(dex)
+        self.source_latency[dex] = time.perf_counter() - started
+        self.source_updated[dex] = time.time()
+        return result
+    
+    def _start_fetches(self):
+        """Start a request for every source that has none outstanding and whose breaker allows it"""
+        for dex in self.sources:
+            if dex not in self._inflight and self._breakers[dex].allow():
+                self._inflight[dex] = asyncio.create_task(self._timed_fetch(dex))
+    
+    def source_health(self) -> Dict[str, Dict]:
+        """Circuit-breaker state, last latency and last update time per source"""
+        return {
+            dex: {
+                **self._breakers[dex].to_dict(),
+                'latency': self.source_latency.get(dex),
+                'updated': self.source_updated.get(dex),
+            }
+            for dex in self.sources
+        }
+    
+    def _collect_finished(self, dex_prices: Dict[str, Dict[str, Tuple[float, float, float]]]):
+        """Move results of finished in-flight fetches into `dex_prices` (failed fetches are left out)"""
+        for dex, task in list(self._inflight.items()):
+            if not task.done():
+                continue
+            del self._inflight[dex]
+            if not task.cancelled() and task.exception() is None:
+                dex_prices[dex] = task.result()
     
     async def fetch_all_prices(self) -> Dict[str, Dict[str, Tuple[float, float, float]]]:
-        """Fetch prices from all DEXes concurrently"""
+        """Fetch prices from all DEXes concurrently, returning whatever answered by the cycle deadline"""
         print(f"[{datetime.now().strftime('%H:%M:%S.%f')[:-3]}] Fetching prices from all DEXes...")
         
-        # Clear pools for fresh data
-        self.pools = []
+        # Fold in sources that answered after the previous cycle's deadline
+        dex_prices = {}
+        self._collect_finished(dex_prices)
         
-        results = await asyncio.gather(
-            self.fetch_jupiter_prices(),
-            self.fetch_raydium_prices(),
-            self.fetch_orca_prices(),
-            self.fetch_birdeye_prices(),
-            self.fetch_meteora_prices(),
-            return_exceptions=True
-        )
+        # Start a request for every healthy source that has none outstanding
+        self._start_fetches()
         
-        dex_prices = {
-            'Jupiter': results[0] if not isinstance(results[0], Exception) else {},
-            'Raydium': results[1] if not isinstance(results[1], Exception) else {},
-            'Orca': results[2] if not isinstance(results[2], Exception) else {},
-            'Birdeye': results[3] if not isinstance(results[3], Exception) else {},
-            'Meteora': results[4] if not isinstance(results[4], Exception) else {}
-        }
+        if self._inflight:
+            await asyncio.wait(list(self._inflight.values()), timeout=self.cycle_deadline)
+        self._collect_finished(dex_prices)
+        
+        if self._inflight:
+            print(f"  ⏱ Deadline passed, still waiting on: {', '.join(self._inflight)}")
         
-        return dex_prices
+        self._publish_pools()
+        return {dex: dex_prices[dex] for dex in self.sources if dex in dex_prices}
     
     def calculate_confidence_score(self, prices: List[float], liquidities: List[float]) -> float:
-        """Calculate confidence score for arbitrage opportunity"""
+        """Calculate confidence score for arbitrage opportunity (single pass, Welford mean/variance).
+        
+        PriceMatrix.aggregate computes the same score for all tokens at once (price_matrix.confidence_kernel).
+        """
         if len(prices) < MIN_SOURCES:
             return 0.0
         
+        count = 0
+        mean_price = 0.0
+        squares = 0.0
+        total_liquidity = 0.0
+        for price, liquidity in zip(prices, liquidities):
+            count += 1
+            delta = price - mean_price
+            mean_price += delta / count
+            squares += delta * (price - mean_price)
+            total_liquidity += liquidity
+        
         # Factor 1: Number of sources (more = better)
-        source_score = min(len(prices) / 5.0, 1.0)  # Max at 5 sources
+        source_score = min(count / CONFIDENCE_SOURCE_CAP, 1.0)
         
         # Factor 2: Price consistency (lower std dev = better)
-        import statistics
-        if len(prices) > 1:
-            mean_price = statistics.mean(prices)
-            std_dev = statistics.stdev(prices)
+        if count > 1:
+            std_dev = math.sqrt(squares / (count - 1))
             consistency_score = max(0, 1 - (std_dev / mean_price))
         else:
             consistency_score = 0.5
         
         # Factor 3: Total liquidity (higher = better)
-        total_liquidity = sum(liquidities)
-        liquidity_score = min(total_liquidity / 100000, 1.0)  # Max at $100k
+        liquidity_score = min(total_liquidity / CONFIDENCE_LIQUIDITY_CAP, 1.0)
         
         # Weighted average
-        confidence = (source_score * 0.4 + consistency_score * 0.4 + liquidity_score * 0.2)
+        w_sources, w_consistency, w_liquidity = self.confidence_weights
+        confidence = (source_score * w_sources + consistency_score * w_consistency + liquidity_score * w_liquidity)
         return round(confidence, 3)
     
     def filter_outliers(self, price_data: List[Tuple[str, float, float, float]]) -> List[Tuple[str, float, float, float]]:
-        """Remove price outliers using median absolute deviation"""
-        if len(price_data) < 3:
+        """Remove price outliers from one token's (dex, price, liquidity, volume) quotes.
+        
+        The configured OUTLIER_METHOD on a single row (price_matrix.robust_outlier_mask); aggregate_prices
+        filters every token at once instead.
+        """
+        if not price_data:
             return price_data
+        price = np.array([[quote[1] for quote in price_data]], dtype=np.float64)
+        kept = robust_outlier_mask(price, np.ones(price.shape, dtype=bool), MAX_PRICE_DEVIATION,
+                                   OUTLIER_METHOD, OUTLIER_MAD_THRESHOLD)[0]
+        return [quote for quote, keep in zip(price_data, kept.tolist()) if keep]
+    
+    def aggregate_prices(self, dex_prices: Dict[str, Dict[str, Tuple[float, float, float]]]) -> 'AggregateView':
+        """Aggregate prices with outlier filtering and confidence scoring.
+        
+        `dex_prices` replaces the quote state (sources missing from it are dropped, except rate-limited
+        ones, which keep their last quotes until they expire); only tokens with a changed quote are
+        re-aggregated, the cached results are reused for the rest.
+        """
+        touched = set()
+        for dex_id in list(self.quotes):
+            dex = self.dex_ids.names[dex_id]
+            if dex in dex_prices or dex in self._rate_limited:
+                continue
+            touched |= self._drop_source(dex_id)
+        for dex, prices in dex_prices.items():
+            touched |= self._merge_source(dex, prices)
+        touched |= self._expire_stale_quotes()
+        
+        self._reevaluate(touched)
+        return self.aggregated_by_symbol()
+    
+    def _evaluate_opportunity(self, symbol: str, data: Dict) -> Optional[ArbitrageRoute]:
+        """Build the min/max route for one aggregated token, or None if it fails the filters"""
+        spread_pct = data['spread_pct']
+        
+        # Apply realistic filters
+        if (data['count'] < MIN_SOURCES or
+            spread_pct < MIN_SPREAD_THRESHOLD * 100 or
+            spread_pct > MAX_SPREAD_THRESHOLD * 100 or
+            data['confidence'] < 0.5):
+            return None
         
-        import statistics
-        prices = [p[1] for p in price_data]
-        median = statistics.median(prices)
+        # Find best buy and sell
+        min_idx = data['prices'].index(data['min'])
+        max_idx = data['prices'].index(data['max'])
         
-        # Filter out prices that deviate too much from median
-        filtered = []
-        for data in price_data:
-            deviation = abs(data[1] - median) / median
-            if deviation <= MAX_PRICE_DEVIATION:
-                filtered.append(data)
+        buy_liquidity = data['liquidities'][min_idx]
+        sell_liquidity = data['liquidities'][max_idx]
         
-        return filtered if filtered else price_data  # Return original if all filtered
+        # Calculate max trade size (5% of pool liquidity)
+        max_trade_size = min(buy_liquidity, sell_liquidity) * MAX_TRADE_FRACTION / data['min']
+        
+        return ArbitrageRoute(
+            token=symbol,
+            buy_dex=data['sources'][min_idx],
+            buy_price=data['min'],
+            buy_liquidity=buy_liquidity,
+            sell_dex=data['sources'][max_idx],
+            sell_price=data['max'],
+            sell_liquidity=sell_liquidity,
+            spread_pct=spread_pct,
+            profit_per_token=data['max'] - data['min'],
+            max_trade_size=max_trade_size,
+            confidence_score=data['confidence']
+        )
+    
+    @staticmethod
+    def _rank_opportunities(opportunities) -> List[ArbitrageRoute]:
+        return sorted(opportunities, key=lambda x: x.confidence_score * x.spread_pct, reverse=True)
     
-    def aggregate_prices(self, dex_prices: Dict[str, Dict[str, Tuple[float, float, float]]]) -> Dict[str, Dict]:
-        """Aggregate prices with outlier filtering and confidence scoring"""
-        aggregated = {}
+    def find_realistic_arbitrage(self, aggregated: Mapping) -> List[ArbitrageRoute]:
+        """Find realistic arbitrage opportunities with strict filtering.
+        
+        For this tracker's own AggregateView the routes _reevaluate built from the arrays are used
+        and no aggregate dict is built. Otherwise, a token whose aggregate is the same object as
+        last call reuses its previous verdict instead of being re-checked.
+        """
+        if isinstance(aggregated, AggregateView) and aggregated.tracker is self:
+            ids = self.token_ids.ids
+            routes = map(self.opportunities.get, (ids[symbol] for symbol in aggregated))
+            return self._rank_opportunities(route for route in routes if route is not None)
         
-        for symbol in TOKENS.keys():
-            # Collect all price data: (dex, price, liquidity, volume)
-            price_data = []
-            
-            for dex, prices in dex_prices.items():
-                if symbol in prices:
-                    price, liquidity, volume = prices[symbol]
-                    price_data.append((dex, price, liquidity, volume))
-            
-            if not price_data:
-                continue
-            
-            # Filter outliers
-            filtered_data = self.filter_outliers(price_data)
-            
-            if len(filtered_data) >= MIN_SOURCES:
-                prices = [p[1] for p in filtered_data]
-                sources = [p[0] for p in filtered_data]
-                liquidities = [p[2] for p in filtered_data]
-                volumes = [p[3] for p in filtered_data]
-                
-                min_price = min(prices)
-                max_price = max(prices)
-                spread_pct = ((max_price - min_price) / min_price) * 100
-                
-                # Calculate confidence
-                confidence = self.calculate_confidence_score(prices, liquidities)
-                
-                aggregated[symbol] = {
-                    'prices': prices,
-                    'sources': sources,
-                    'liquidities': liquidities,
-                    'volumes': volumes,
-                    'min': min_price,
-                    'max': max_price,
-                    'avg': sum(prices) / len(prices),
-                    'spread_pct': spread_pct,
-                    'count': len(prices),
-                    'confidence': confidence,
-                    'total_liquidity': sum(liquidities),
-                    'total_volume_24h': sum(volumes)
-                }
-        
-        return aggregated
-    
-    def find_realistic_arbitrage(self, aggregated: Dict) -> List[ArbitrageRoute]:
-        """Find realistic arbitrage opportunities with strict filtering"""
         opportunities = []
+        routes = {}
+        intern = self.token_ids.intern
         
         for symbol, data in aggregated.items():
-            spread_pct = data['spread_pct']
-            
-            # Apply realistic filters
-            if (data['count'] < MIN_SOURCES or
-                spread_pct < MIN_SPREAD_THRESHOLD * 100 or
-                spread_pct > MAX_SPREAD_THRESHOLD * 100 or
-                data['confidence'] < 0.5):
+            token = intern(symbol)
+            cached = self._route_cache.get(token)
+            route = cached[1] if cached and cached[0] is data else self._evaluate_opportunity(symbol, data)
+            routes[token] = (data, route)
+            if route is not None:
+                opportunities.append(route)
+        
+        self._route_cache = routes
+        return self._rank_opportunities(opportunities)
+    
+    def _fee_rates(self, rows: np.ndarray, sources: int) -> np.ndarray:
+        """Swap fee per (token row, source): the fee of the deepest tracked pool, else the source default"""
+        names = self.dex_ids.names
+        defaults = [SOURCE_FEE_RATES.get(names[s], DEFAULT_FEE_RATE) if s < len(names) else DEFAULT_FEE_RATE
+                    for s in range(sources)]
+        fees = np.tile(np.array(defaults, dtype=np.float64), (len(rows), 1))
+        
+        snapshot = self.pool_snapshot
+        if not len(snapshot):
+            return fees
+        position = np.full(len(self.token_ids), -1, dtype=np.int64)
+        position[rows] = np.arange(len(rows))
+        row = position[snapshot.column('token_a')]
+        dex = snapshot.column('dex')
+        usable = (row >= 0) & (dex < sources)
+        
+        # Deepest pool first within each (row, dex), then keep the first of each
+        order = np.lexsort((-snapshot.column('liquidity_usd')[usable], dex[usable], row[usable]))
+        keys = (row[usable] * sources + dex[usable])[order]
+        _, first = np.unique(keys, return_index=True)
+        picked = order[first]
+        fees[row[usable][picked], dex[usable][picked]] = snapshot.column('fee_rate')[usable][picked]
+        return fees
+    
+    def find_pair_arbitrage(self) -> List[ArbitrageRoute]:
+        """Rank every qualifying buy/sell source pair of every aggregated token, after fees and depth.
+        
+        Unlike find_realistic_arbitrage this is not limited to the min/max pair: a pair qualifies when
+        its spread net of both swap fees is at least MIN_SPREAD_THRESHOLD, its gross spread at most
+        MAX_SPREAD_THRESHOLD and both legs have MIN_LIQUIDITY_USD. Pairs are ranked by expected profit
+        at MAX_TRADE_FRACTION of the shallower leg. Works on the aggregated quote state.
+        """
+        self._build_records()
+        if not self.aggregated:
+            return []
+        
+        matrix = self.price_matrix
+        rows = np.fromiter(self.aggregated, dtype=np.int64, count=len(self.aggregated))
+        result = self._aggregate_rows(rows)
+        # Same token-level gates as find_realistic_arbitrage
+        kept = result.kept & (result.valid & (result.confidence >= 0.5))[:, None]
+        price, liquidity = matrix.price[rows], matrix.liquidity[rows]
+        
+        pairs = rank_pairs(price, liquidity, kept, self._fee_rates(rows, kept.shape[1]),
+                           MIN_SPREAD_THRESHOLD, MAX_SPREAD_THRESHOLD, MIN_LIQUIDITY_USD, MAX_TRADE_FRACTION)
+        
+        names = self.dex_ids.names
+        token_names = self.token_ids.names
+        return [
+            ArbitrageRoute(
+                token=token_names[rows[row]],
+                buy_dex=names[buy],
+                buy_price=float(price[row, buy]),
+                buy_liquidity=float(liquidity[row, buy]),
+                sell_dex=names[sell],
+                sell_price=float(price[row, sell]),
+                sell_liquidity=float(liquidity[row, sell]),
+                spread_pct=spread,
+                profit_per_token=profit,
+                max_trade_size=size,
+                confidence_score=float(result.confidence[row]),
+                net_spread_pct=net
+            )
+            for row, buy, sell, spread, net, profit, size in zip(
+                pairs.row.tolist(), pairs.buy_source.tolist(), pairs.sell_source.tolist(),
+                pairs.spread_pct.tolist(), pairs.net_spread_pct.tolist(),
+                pairs.profit_per_token.tolist(), pairs.trade_size.tolist())
+        ]
+    
+    def _publish_pools(self):
+        """Swap in a snapshot of the pool table if it changed; readers holding the previous one are unaffected"""
+        if self.pools.version == self._published_version:
+            return
+        self._published_version = self.pools.version
+        self.pool_snapshot = self.pools.snapshot(self.pool_snapshot.sequence + 1)
+    
+    def _merge_source(self, dex: str, prices: Dict[str, Tuple[float, float, float]]) -> set:
+        """Replace a source's quotes in the streaming state and return the token ids whose quote changed"""
+        token_ids = list(map(self.token_ids.ids.get, prices))
+        if None in token_ids:
+            token_ids = list(map(self.token_ids.intern, prices))
+        quotes = dict(zip(token_ids, prices.values()))
+        dex_id = self.dex_ids.intern(dex)
+        arrived = dict.fromkeys(quotes, time.time())
+        requested = self._partial_refresh.pop(dex_id, None)
+        if requested is not None:
+            # Only `requested` were refetched; the source's other quotes still stand, with their arrival times
+            self._adaptive_sources.add(dex_id)
+            kept = {token: quote for token, quote in self.quotes.get(dex_id, {}).items() if token not in requested}
+            quotes = {**kept, **quotes}
+            previous = self.quote_times.get(dex_id, {})
+            arrived = {**{token: previous[token] for token in kept}, **arrived}
+        self.quotes[dex_id] = quotes
+        self.quote_times[dex_id] = arrived
+        return set(self.price_matrix.load_source(dex_id, quotes).tolist())
+    
+    def _drop_source(self, dex_id: int) -> set:
+        """Remove a source's quotes from the state and return the token ids that had one"""
+        self.quotes.pop(dex_id, None)
+        self.quote_times.pop(dex_id, None)
+        return set(self.price_matrix.clear_source(dex_id).tolist())
+    
+    def _expire_stale_quotes(self) -> set:
+        """Drop quotes that are too old; return the token ids affected.
+        
+        A quote expires after QUOTE_MAX_AGE or three of its source's poll intervals, whichever is longer.
+        For sources refreshed per token (adaptive polling) the token's own refresh interval counts as the
+        poll interval, so a quiet token is not expired between two of its scheduled refetches.
+        """
+        now = time.time()
+        touched = set()
+        for dex_id, arrived in list(self.quote_times.items()):
+            source = self.sources.get(self.dex_ids.names[dex_id])
+            max_age = max(QUOTE_MAX_AGE, 3 * source.poll_interval) if source else 0
+            if not arrived or now - min(arrived.values()) <= max_age:
                 continue
+            if dex_id in self._adaptive_sources and self.refresh_policy:
+                intervals = self.refresh_policy.intervals
+                stale = [token for token, at in arrived.items()
+                         if now - at > max(max_age, 3 * intervals.get(token, UPDATE_INTERVAL))]
+            else:
+                stale = [token for token, at in arrived.items() if now - at > max_age]
             
-            # Find best buy and sell
-            min_idx = data['prices'].index(data['min'])
-            max_idx = data['prices'].index(data['max'])
-            
-            buy_liquidity = data['liquidities'][min_idx]
-            sell_liquidity = data['liquidities'][max_idx]
-            
-            # Calculate max trade size (5% of pool liquidity)
-            max_trade_size = min(buy_liquidity, sell_liquidity) * 0.05 / data['min']
-            
-            route = ArbitrageRoute(
-                token=symbol,
-                buy_dex=data['sources'][min_idx],
-                buy_price=data['min'],
+            if len(stale) == len(arrived):
+                touched |= self._drop_source(dex_id)
+            elif stale:
+                quotes = self.quotes[dex_id]
+                for token in stale:
+                    del quotes[token]
+                    del arrived[token]
+                touched |= set(self.price_matrix.load_source(dex_id, quotes).tolist())
+        return touched
+    
+    def _aggregate_rows(self, rows: np.ndarray):
+        """Outlier-filter and aggregate the quote matrix rows of the token ids in `rows`"""
+        return self.price_matrix.aggregate(MIN_SOURCES, MAX_PRICE_DEVIATION, OUTLIER_METHOD, OUTLIER_MAD_THRESHOLD,
+                                           self.confidence_weights, (CONFIDENCE_SOURCE_CAP, CONFIDENCE_LIQUIDITY_CAP),
+                                           rows)
+    
+    def _reevaluate(self, tokens: set):
+        """Re-aggregate and re-check opportunities for the token ids in `tokens` only.
+        
+        Routes are built from the aggregate arrays; the per-token aggregate dicts are built only
+        when the state is read (_build_records).
+        """
+        if not tokens:
+            return
+        rows = np.fromiter(tokens, dtype=np.int64, count=len(tokens))
+        self.price_matrix.reserve(int(rows.max()) + 1, len(self.dex_ids))
+        result = self._aggregate_rows(rows)
+        
+        tokens = rows.tolist()
+        for token in tokens:
+            self.aggregated.pop(token, None)
+            self.opportunities.pop(token, None)
+        self._unbuilt.difference_update(tokens)
+        self._unbuilt.update(rows[result.valid].tolist())
+        
+        if self.refresh_policy:
+            valid = np.flatnonzero(result.valid)
+            for token, price, spread in zip(rows[valid].tolist(), result.avg[valid].tolist(),
+                                            result.spread_pct[valid].tolist()):
+                self.refresh_policy.observe(token, price, spread)
+        
+        self.opportunities.update(self._routes(result, rows))
+    
+    def _routes(self, result, rows: np.ndarray) -> Dict[int, ArbitrageRoute]:
+        """The min/max route of every row that passes _evaluate_opportunity's filters, by token id"""
+        # valid means count >= MIN_SOURCES
+        candidate = np.flatnonzero(result.valid & (result.spread_pct >= MIN_SPREAD_THRESHOLD * 100) &
+                                   (result.spread_pct <= MAX_SPREAD_THRESHOLD * 100) & (result.confidence >= 0.5))
+        tokens = rows[candidate]
+        buy, sell = result.buy_source[candidate], result.sell_source[candidate]
+        liquidity = self.price_matrix.liquidity
+        symbols, dexes = self.token_ids.names, self.dex_ids.names
+        
+        routes = {}
+        for token, buy_dex, sell_dex, low, high, buy_liquidity, sell_liquidity, spread_pct, confidence in zip(
+                tokens.tolist(), buy.tolist(), sell.tolist(), result.min[candidate].tolist(),
+                result.max[candidate].tolist(), liquidity[tokens, buy].tolist(), liquidity[tokens, sell].tolist(),
+                result.spread_pct[candidate].tolist(), result.confidence[candidate].tolist()):
+            routes[token] = ArbitrageRoute(
+                token=symbols[token],
+                buy_dex=dexes[buy_dex],
+                buy_price=low,
                 buy_liquidity=buy_liquidity,
-                sell_dex=data['sources'][max_idx],
-                sell_price=data['max'],
+                sell_dex=dexes[sell_dex],
+                sell_price=high,
                 sell_liquidity=sell_liquidity,
                 spread_pct=spread_pct,
-                profit_per_token=data['max'] - data['min'],
-                max_trade_size=max_trade_size,
-                confidence_score=data['confidence']
+                profit_per_token=high - low,
+                max_trade_size=min(buy_liquidity, sell_liquidity) * MAX_TRADE_FRACTION / low,
+                confidence_score=confidence
             )
+        return routes
+    
+    def _build_records(self):
+        """Build the aggregate dicts of the tokens _reevaluate changed since the last read"""
+        if not self._unbuilt:
+            return
+        rows = np.fromiter(self._unbuilt, dtype=np.int64, count=len(self._unbuilt))
+        self._unbuilt.clear()
+        result = self._aggregate_rows(rows)
+        opportunities = self.opportunities
+        tokens = rows.tolist()
+        for row, data in self.price_matrix.records(result, rows, self.dex_ids.names).items():
+            token = tokens[row]
+            self.aggregated[token] = data
+            # _reevaluate already checked it, so find_realistic_arbitrage can reuse the verdict
+            self._route_cache[token] = (data, opportunities.get(token))
+    
+    def aggregated_by_symbol(self) -> 'AggregateView':
+        """The streaming state's aggregated prices keyed by symbol, in token order (for output).
+        
+        Returns a view: the per-token dicts are only built when first read (see AggregateView).
+        """
+        valid = self._unbuilt.union(self.aggregated)
+        ids = self.token_ids.ids
+        return AggregateView(self, [symbol for symbol in self.tokens if ids[symbol] in valid])
+    
+    def _read_aggregate(self, symbol: str) -> Dict:
+        """One token's aggregate dict, with source freshness ('latencies', 'ages') filled in.
+        
+        Freshness is filled in at read time: an aggregate is only rebuilt when its quotes change,
+        and its quotes keep ageing while they do not. 'ages' is per quote (adaptively polled
+        sources refresh tokens at different times).
+        """
+        self._build_records()
+        token = self.token_ids.ids.get(symbol)
+        data = self.aggregated.get(token)
+        if data is None:
+            raise KeyError(symbol)
+        now = time.time()
+        ids = self.dex_ids.ids
+        data['latencies'] = [self.source_latency.get(dex) for dex in data['sources']]
+        data['ages'] = [now - self.quote_times[ids[dex]][token] for dex in data['sources']]
+        return data
+    
+    def _symbols(self, tokens: set) -> set:
+        return {self.token_ids.names[token] for token in tokens}
+    
+    async def stream_prices(self) -> AsyncIterator[Tuple[str, set, List[ArbitrageRoute]]]:
+        """Run one cycle as a streaming pipeline.
+        
+        Each source result is merged into the per-token state as soon as it arrives, only the tokens
+        it changed are re-aggregated and re-checked, and (dex, changed_symbols, ranked opportunities)
+        is yielded. The cycle ends at the deadline; late sources are folded into the next cycle.
+        """
+        print(f"[{datetime.now().strftime('%H:%M:%S.%f')[:-3]}] Streaming prices from all DEXes...")
+        
+        expired = self._expire_stale_quotes()
+        if expired:
+            self._reevaluate(expired)
+        
+        # Results that arrived after the previous cycle's deadline are merged first
+        finished = {}
+        self._collect_finished(finished)
+        
+        self._start_fetches()
+        
+        deadline = None if self.cycle_deadline is None else time.perf_counter() + self.cycle_deadline
+        
+        while True:
+            for dex, prices in finished.items():
+                touched = self._merge_source(dex, prices)
+                self._reevaluate(touched)
+                self._publish_pools()
+                yield dex, self._symbols(touched), self._rank_opportunities(self.opportunities.values())
+            
+            if not self._inflight:
+                break
+            remaining = None if deadline is None else deadline - time.perf_counter()
+            if remaining is not None and remaining <= 0:
+                break
             
-            opportunities.append(route)
+            await asyncio.wait(list(self._inflight.values()), timeout=remaining,
+                               return_when=asyncio.FIRST_COMPLETED)
+            finished = {}
+            self._collect_finished(finished)
         
-        return sorted(opportunities, key=lambda x: x.confidence_score * x.spread_pct, reverse=True)
+        if self._inflight:
+            print(f"  ⏱ Deadline passed, still waiting on: {', '.join(self._inflight)}")
+    
+    def start_scheduler(self):
+        """Poll every registered source independently on its own `poll_interval` (with jitter)"""
+        for name in self.sources:
+            if name not in self._pollers:
+                self._pollers[name] = asyncio.create_task(self._poll_source(name))
+    
+    async def stop_scheduler(self):
+        for task in self._pollers.values():
+            task.cancel()
+        if self._pollers:
+            await asyncio.gather(*self._pollers.values(), return_exceptions=True)
+        self._pollers.clear()
+    
+    async def _poll_source(self, name: str):
+        """Poll loop for one source: fetch, merge into the latest-quote state, notify, sleep"""
+        while name in self.sources:
+            source = self.sources[name]
+            
+            if self._breakers[name].allow():
+                try:
+                    prices = await self._timed_fetch(name)
+                except Exception:
+                    pass  # reported and counted by _timed_fetch
+                else:
+                    touched = self._merge_source(name, prices)
+                    self._publish_pools()
+                    if touched:
+                        self._reevaluate(touched)
+                        self._updates.put_nowait((name, touched))
+            
+            await asyncio.sleep(source.poll_interval * random.uniform(1 - POLL_JITTER, 1 + POLL_JITTER))
+    
+    async def scheduled_updates(self) -> AsyncIterator[Tuple[Optional[str], set, List[ArbitrageRoute]]]:
+        """Yield (dex, changed_symbols, ranked opportunities) each time a scheduled poll lands.
+        
+        Aggregation always uses the most recent quote from each source; stale quotes are expired here.
+        If no poll lands for UPDATE_INTERVAL (every source failing or circuit-open), the loop still
+        wakes, expires stale quotes and yields with dex None, so dead sources' opportunities go away.
+        """
+        while True:
+            try:
+                dex, touched = await asyncio.wait_for(self._updates.get(), UPDATE_INTERVAL)
+            except asyncio.TimeoutError:
+                dex, touched = None, set()
+            
+            expired = self._expire_stale_quotes()
+            if expired:
+                self._reevaluate(expired)
+            
+            yield dex, self._symbols(touched | expired), self._rank_opportunities(self.opportunities.values())
     
     def display_prices(self, aggregated: Dict, opportunities: List[ArbitrageRoute]):
         """Display current prices and realistic opportunities"""
@@ -478,7 +2281,8 @@ class MultiDEXPriceTracker:
             print("🎯 REALISTIC ARBITRAGE OPPORTUNITIES\n")
             for i, opp in enumerate(opportunities, 1):
                 profit_usd = opp.profit_per_token * opp.max_trade_size
-                print(f"{i}. {opp.token} | Confidence: {opp.confidence_score:.1%} | Spread: {opp.spread_pct:.2f}%")
+                print(f"{i}. {opp.token} | Confidence: {opp.confidence_score:.1%} | Spread: {opp.spread_pct:.2f}%" +
+                      (f" ({opp.net_spread_pct:.2f}% after fees)" if opp.net_spread_pct is not None else ""))
                 print(f"   Buy:  {opp.buy_dex:10} @ ${opp.buy_price:.6f}  (Liq: ${opp.buy_liquidity:,.0f})")
                 print(f"   Sell: {opp.sell_dex:10} @ ${opp.sell_price:.6f}  (Liq: ${opp.sell_liquidity:,.0f})")
                 print(f"   Max Trade: {opp.max_trade_size:,.2f} {opp.token} (~${profit_usd:,.2f} profit potential)")
@@ -489,18 +2293,20 @@ class MultiDEXPriceTracker:
                   f"${MIN_LIQUIDITY_USD:,}+ liquidity, {MIN_SOURCES}+ sources)")
     
     def export_for_gpu_routing(self, filename: str = "pools_for_gpu.json"):
-        """Export pool data for GPU multi-hop routing"""
+        """Export pool data for GPU multi-hop routing (the last complete snapshot)"""
+        snapshot = self.pool_snapshot
         data = {
             'timestamp': datetime.now().isoformat(),
-            'pool_count': len(self.pools),
-            'pools': [pool.to_dict() for pool in self.pools],
-            'tokens': TOKENS
+            'sequence': snapshot.sequence,
+            'pool_count': len(snapshot),
+            'pools': [pool.to_dict() for pool in snapshot],
+            'tokens': self.tokens
         }
         
         with open(filename, 'w') as f:
             json.dump(data, f, indent=2)
         
-        print(f"✓ Exported {len(self.pools)} pools to {filename} for GPU routing")
+        print(f"✓ Exported {len(snapshot)} pools to {filename} for GPU routing")
     
     def save_to_json(self, aggregated: Dict, opportunities: List[ArbitrageRoute], 
                      filename: str = "realistic_arbitrage.json"):
@@ -513,7 +2319,7 @@ class MultiDEXPriceTracker:
                 'min_liquidity': MIN_LIQUIDITY_USD,
                 'min_sources': MIN_SOURCES
             },
-            'prices': aggregated,
+            'prices': dict(aggregated),
             'opportunities': [opp.to_dict() for opp in opportunities]
         }
         
@@ -523,37 +2329,71 @@ class MultiDEXPriceTracker:
 
 async def main():
     print("SOLANA REALISTIC ARBITRAGE TRACKER")
-    print(f"Tracking: {', '.join(TOKENS.keys())}")
+    tokens = load_tokens(TOKENS_FILE) if TOKENS_FILE else TOKENS
+    if TOKEN_DISCOVERY:
+        print(f"Tracking: tokens with liquid USDC pools on {MIN_SOURCES}+ DEXes (rescanned every {TOKEN_DISCOVERY_INTERVAL}s)")
+    else:
+        print(f"Tracking: {len(tokens)} tokens" if len(tokens) > 20 else f"Tracking: {', '.join(tokens)}")
     print(f"Update interval: {UPDATE_INTERVAL}s")
     print(f"Filters: {MIN_SPREAD_THRESHOLD*100}%-{MAX_SPREAD_THRESHOLD*100}% spread, " +
           f"${MIN_LIQUIDITY_USD:,}+ liquidity, {MIN_SOURCES}+ sources")
     print("="*80)
     
-    async with MultiDEXPriceTracker() as tracker:
+    async with MultiDEXPriceTracker(tokens=tokens) as tracker:
         iteration = 1
         
+        def report(aggregated: Dict, opportunities: List[ArbitrageRoute]):
+            if ALL_PAIRS_ARBITRAGE:
+                # Every qualifying source pair, not only each token's min/max pair
+                opportunities = tracker.find_pair_arbitrage()
+            
+            # Display results
+            tracker.display_prices(aggregated, opportunities)
+            
+            # Save data
+            tracker.save_to_json(aggregated, opportunities)
+            tracker.export_for_gpu_routing()
+        
         try:
-            while True:
-                # Fetch all prices
-                dex_prices = await tracker.fetch_all_prices()
-                
-                # Aggregate with filtering
-                aggregated = tracker.aggregate_prices(dex_prices)
-                
-                # Find realistic opportunities
-                opportunities = tracker.find_realistic_arbitrage(aggregated)
-                
-                # Display results
-                tracker.display_prices(aggregated, opportunities)
-                
-                # Save data
-                tracker.save_to_json(aggregated, opportunities)
-                tracker.export_for_gpu_routing()
-                
-                print(f"\n[Iteration {iteration}] Waiting {UPDATE_INTERVAL}s before next update...")
-                await asyncio.sleep(UPDATE_INTERVAL)
-                iteration += 1
+            if SCHEDULED_POLLING:
+                # Each source polls on its own cadence; opportunities are re-checked on every update
+                tracker.start_scheduler()
+                last_report = time.monotonic()
                 
+                async for dex, touched, opportunities in tracker.scheduled_updates():
+                    if dex is not None:
+                        print(f"  ✓ {dex}: {len(touched)} tokens changed, {len(opportunities)} opportunities")
+                    
+                    if time.monotonic() - last_report >= UPDATE_INTERVAL:
+                        report(tracker.aggregated_by_symbol(), opportunities)
+                        print(f"\n[Report {iteration}] Next report in {UPDATE_INTERVAL}s")
+                        last_report = time.monotonic()
+                        iteration += 1
+            else:
+                # Lock-step cycles: every source is fetched each UPDATE_INTERVAL
+                while True:
+                    if STREAMING_PIPELINE:
+                        # Merge, aggregate and detect per source as results arrive
+                        opportunities = []
+                        async for dex, touched, opportunities in tracker.stream_prices():
+                            print(f"  ✓ {dex}: {len(touched)} tokens changed, {len(opportunities)} opportunities")
+                        aggregated = tracker.aggregated_by_symbol()
+                    else:
+                        # Fetch all prices
+                        dex_prices = await tracker.fetch_all_prices()
+                        
+                        # Aggregate with filtering
+                        aggregated = tracker.aggregate_prices(dex_prices)
+                        
+                        # Find realistic opportunities
+                        opportunities = tracker.find_realistic_arbitrage(aggregated)
+                    
+                    report(aggregated, opportunities)
+                    
+                    print(f"\n[Iteration {iteration}] Waiting {UPDATE_INTERVAL}s before next update...")
+                    await asyncio.sleep(UPDATE_INTERVAL)
+                    iteration += 1
+                    
         except KeyboardInterrupt:
             print("\n\n✓ Shutting down gracefully...")
 
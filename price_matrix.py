@@ -0,0 +1,343 @@
+"""
+Array-backed price aggregation for the multi-DEX price tracker
+Quotes live in dense token x source matrices; every token is aggregated in a few NumPy passes
+Filter and scoring settings are passed in by the caller (the multi_dex_prices configuration)
+"""
+
+from dataclasses import dataclass
+from itertools import chain
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+# Outlier filter
+OUTLIER_MIN_QUOTES = 3           # rows with fewer quotes are not filtered
+MAD_SCALE = 1.4826               # MAD -> standard deviation for normally distributed prices
+
+
+def confidence_kernel(price: np.ndarray, liquidity: np.ndarray, kept: np.ndarray, min_sources: int,
+                      weights: Tuple[float, float, float], source_cap: float,
+                      liquidity_cap: float) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Confidence score for every row in one pass over the source columns.
+
+    Count, mean and sum of squared deviations are updated per column with Welford's method
+    (numerically stable, no second pass for the stdev), together with total liquidity.
+    The score is `weights` = (sources, consistency, liquidity) applied to min(count / source_cap, 1),
+    max(0, 1 - stdev / mean) (0.5 for a single quote) and min(liquidity / liquidity_cap, 1),
+    rounded to 3 decimals; rows with fewer than `min_sources` kept quotes score 0.
+    Returns (confidence, mean price, total liquidity).
+    """
+    rows = len(kept)
+    count = np.zeros(rows)
+    mean = np.zeros(rows)
+    squares = np.zeros(rows)
+    total_liquidity = np.zeros(rows)
+    for column in range(kept.shape[1]):
+        present = kept[:, column]
+        count += present
+        delta = np.where(present, price[:, column] - mean, 0.0)
+        mean += delta / np.maximum(count, 1)
+        squares += delta * np.where(present, price[:, column] - mean, 0.0)
+        total_liquidity += np.where(present, liquidity[:, column], 0.0)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        std_dev = np.sqrt(squares / np.maximum(count - 1, 1))
+        consistency = np.where(count > 1, np.maximum(0.0, 1 - std_dev / mean), 0.5)
+
+    w_sources, w_consistency, w_liquidity = weights
+    confidence = np.round(
+        w_sources * np.minimum(count / source_cap, 1.0) +
+        w_consistency * consistency +
+        w_liquidity * np.minimum(total_liquidity / liquidity_cap, 1.0), 3)
+    return np.where(count >= min_sources, confidence, 0.0), mean, total_liquidity
+
+
+def masked_median(values: np.ndarray, mask: np.ndarray) -> np.ndarray:
+    """Per-row median of the masked entries by selection (np.partition), NaN for empty rows.
+
+    Rows are grouped by how many entries they have, so there is one partition call per
+    distinct count rather than one per row, and no full sort.
+    """
+    count = mask.sum(axis=1)
+    filled = np.where(mask, values, np.inf)
+    median = np.full(len(values), np.nan)
+    for n in np.unique(count).tolist():
+        if n == 0:
+            continue
+        rows = np.flatnonzero(count == n)
+        low, high = (n - 1) // 2, n // 2
+        selected = np.partition(filled[rows], (low, high) if low != high else low, axis=1)
+        median[rows] = (selected[:, low] + selected[:, high]) / 2
+    return median
+
+
+def robust_outlier_mask(price: np.ndarray, mask: np.ndarray, max_deviation: float, method: str,
+                        mad_threshold: float, min_quotes: int = OUTLIER_MIN_QUOTES) -> np.ndarray:
+    """Mask of the quotes that survive the outlier filter, for every row of a token x source matrix.
+
+    'pct' drops quotes more than `max_deviation` (a fraction) away from the row median;
+    'mad' drops quotes whose robust z-score |price - median| / (MAD_SCALE * MAD) exceeds
+    `mad_threshold`, falling back to 'pct' for rows whose MAD is 0. Rows with fewer than
+    `min_quotes` quotes are left alone, and a row that would lose every quote keeps them all.
+    """
+    if method not in ('pct', 'mad'):
+        raise ValueError(f"unknown outlier method {method!r}")
+
+    kept = mask.copy()
+    rows = np.flatnonzero(mask.sum(axis=1) >= min_quotes)
+    if not len(rows):
+        return kept
+
+    sub_mask = mask[rows]
+    sub_price = price[rows]
+    median = masked_median(sub_price, sub_mask)[:, None]
+    deviation = np.abs(sub_price - median)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        within = deviation / median <= max_deviation
+        if method == 'mad':
+            mad = MAD_SCALE * masked_median(deviation, sub_mask)[:, None]
+            within = np.where(mad > 0, deviation / mad <= mad_threshold, within)
+    within &= sub_mask
+
+    none_kept = ~within.any(axis=1)
+    within[none_kept] = sub_mask[none_kept]
+    kept[rows] = within
+    return kept
+
+
+@dataclass
+class MatrixAggregate:
+    """Per-token aggregation results; row i belongs to token id i"""
+    kept: np.ndarray             # bool (tokens x sources): quote present and not an outlier
+    count: np.ndarray            # int: kept quotes per token
+    valid: np.ndarray            # bool: count >= min_sources
+    min: np.ndarray
+    max: np.ndarray
+    avg: np.ndarray
+    spread_pct: np.ndarray
+    confidence: np.ndarray
+    total_liquidity: np.ndarray
+    total_volume: np.ndarray
+    buy_source: np.ndarray       # source id of the cheapest kept quote
+    sell_source: np.ndarray      # source id of the most expensive kept quote
+
+
+class PriceMatrix:
+    """Latest quote per (token id, source id) as dense float64 matrices plus a presence mask.
+
+    Rows grow by doubling as token ids appear; source ids are the columns.
+    """
+
+    def __init__(self, tokens: int = 0, sources: int = 0):
+        self.price = np.zeros((0, 0))
+        self.liquidity = np.zeros((0, 0))
+        self.volume = np.zeros((0, 0))
+        self.mask = np.zeros((0, 0), dtype=bool)
+        self.reserve(tokens, sources)
+
+    @property
+    def shape(self) -> Tuple[int, int]:
+        return self.mask.shape
+
+    def reserve(self, tokens: int, sources: int):
+        """Make room for token ids < `tokens` and source ids < `sources`"""
+        rows, cols = self.mask.shape
+        if tokens <= rows and sources <= cols:
+            return
+        new_rows = max(tokens, rows)
+        if new_rows > rows:
+            new_rows = max(new_rows, 2 * rows, 16)
+        new_cols = max(sources, cols)
+
+        for name in ('price', 'liquidity', 'volume', 'mask'):
+            old = getattr(self, name)
+            grown = np.zeros((new_rows, new_cols), dtype=old.dtype)
+            grown[:rows, :cols] = old
+            setattr(self, name, grown)
+
+    def set_quote(self, token: int, source: int, price: float, liquidity: float, volume: float):
+        self.reserve(token + 1, source + 1)
+        self.price[token, source] = price
+        self.liquidity[token, source] = liquidity
+        self.volume[token, source] = volume
+        self.mask[token, source] = True
+
+    def clear_quote(self, token: int, source: int):
+        if token < self.mask.shape[0] and source < self.mask.shape[1]:
+            self.mask[token, source] = False
+
+    def clear_token(self, token: int):
+        if token < self.mask.shape[0]:
+            self.mask[token] = False
+
+    def clear_source(self, source: int) -> np.ndarray:
+        """Drop one source's quotes; returns the token ids that had one"""
+        if source >= self.mask.shape[1]:
+            return np.zeros(0, dtype=np.int64)
+        dirty = np.flatnonzero(self.mask[:, source])
+        self.mask[:, source] = False
+        return dirty
+
+    def load_source(self, source: int, quotes: Dict[int, Tuple[float, float, float]]) -> np.ndarray:
+        """Replace one source's column with `quotes` (token id -> (price, liquidity, volume)).
+
+        Returns the dirty token ids: those whose quote from this source appeared, disappeared or changed.
+        """
+        tokens = np.fromiter(quotes.keys(), dtype=np.int64, count=len(quotes))
+        values = np.fromiter(chain.from_iterable(quotes.values()), dtype=np.float64,
+                             count=3 * len(quotes)).reshape(len(quotes), 3)
+        self.reserve(int(tokens.max()) + 1 if len(tokens) else 0, source + 1)
+
+        old_mask = self.mask[:, source].copy()
+        old_values = np.stack((self.price[:, source], self.liquidity[:, source], self.volume[:, source]), axis=1)
+
+        self.mask[:, source] = False
+        self.price[tokens, source] = values[:, 0]
+        self.liquidity[tokens, source] = values[:, 1]
+        self.volume[tokens, source] = values[:, 2]
+        self.mask[tokens, source] = True
+
+        dirty = old_mask != self.mask[:, source]
+        # Quotes present before and after only count if a value changed
+        was_quoted = old_mask[tokens]
+        kept = tokens[was_quoted]
+        changed = (old_values[kept] != values[was_quoted]).any(axis=1)
+        dirty[kept[changed]] = True
+        return np.flatnonzero(dirty)
+
+    def aggregate(self, min_sources: int, max_deviation: float, outlier_method: str, mad_threshold: float,
+                  confidence_weights: Tuple[float, float, float], confidence_caps: Tuple[float, float],
+                  rows: Optional[np.ndarray] = None) -> MatrixAggregate:
+        """Outlier-filter and aggregate every token (or only `rows`, token ids) at once.
+
+        With the 'pct' filter this matches the original per-token aggregation (bench_multi_dex.py):
+        with 3+ quotes, quotes more than `max_deviation` from the median are dropped.
+        """
+        price, liquidity, volume, mask = self.price, self.liquidity, self.volume, self.mask
+        if rows is not None:
+            price, liquidity, volume, mask = price[rows], liquidity[rows], volume[rows], mask[rows]
+
+        kept = robust_outlier_mask(price, mask, max_deviation, outlier_method, mad_threshold)
+
+        count = kept.sum(axis=1)
+        valid = count >= max(min_sources, 1)
+        confidence, avg, total_liquidity = confidence_kernel(price, liquidity, kept, min_sources,
+                                                             confidence_weights, *confidence_caps)
+
+        low = np.where(kept, price, np.inf)
+        high = np.where(kept, price, -np.inf)
+        buy_source = low.argmin(axis=1)
+        sell_source = high.argmax(axis=1)
+        rows_idx = np.arange(len(count))
+        min_price = low[rows_idx, buy_source]
+        max_price = high[rows_idx, sell_source]
+
+        total_volume = np.where(kept, volume, 0.0).sum(axis=1)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            spread_pct = (max_price - min_price) / min_price * 100
+
+        return MatrixAggregate(
+            kept=kept, count=count, valid=valid, min=min_price, max=max_price, avg=avg,
+            spread_pct=spread_pct, confidence=confidence, total_liquidity=total_liquidity,
+            total_volume=total_volume, buy_source=buy_source, sell_source=sell_source
+        )
+
+    def records(self, result: MatrixAggregate, tokens: np.ndarray, source_names: List[str],
+                rows: Optional[np.ndarray] = None) -> Dict[int, Dict]:
+        """Today's per-token aggregate dicts for result `rows` (default: every valid row), keyed by row.
+
+        `tokens` maps result rows to token ids (as passed to aggregate, or arange for all rows).
+        The kept quotes of all rows are gathered into flat lists in one pass and sliced per row;
+        rows with the same kept sources share one source-name lookup.
+        """
+        if rows is None:
+            rows = np.flatnonzero(result.valid)
+        if not len(rows):
+            return {}
+        kept = result.kept[rows]
+        token_ids = tokens[rows]
+        ends = np.cumsum(kept.sum(axis=1)).tolist()
+        prices = self.price[token_ids][kept].tolist()
+        liquidities = self.liquidity[token_ids][kept].tolist()
+        volumes = self.volume[token_ids][kept].tolist()
+        packed = np.packbits(kept, axis=1)
+        width = packed.shape[1]
+        packed = packed.tobytes()
+
+        names = {}
+        records = {}
+        start = 0
+        for index, (row, end, low, high, avg, spread, count, confidence, liquidity, volume) in enumerate(zip(
+                rows.tolist(), ends, result.min[rows].tolist(), result.max[rows].tolist(),
+                result.avg[rows].tolist(), result.spread_pct[rows].tolist(), result.count[rows].tolist(),
+                result.confidence[rows].tolist(), result.total_liquidity[rows].tolist(),
+                result.total_volume[rows].tolist())):
+            pattern = packed[index * width:(index + 1) * width]
+            sources = names.get(pattern)
+            if sources is None:
+                columns = np.flatnonzero(kept[index]).tolist()
+                sources = names[pattern] = [source_names[column] for column in columns]
+            records[row] = {
+                'prices': prices[start:end],
+                'sources': list(sources),
+                'liquidities': liquidities[start:end],
+                'volumes': volumes[start:end],
+                'min': low,
+                'max': high,
+                'avg': avg,
+                'spread_pct': spread,
+                'count': count,
+                'confidence': confidence,
+                'total_liquidity': liquidity,
+                'total_volume_24h': volume,
+            }
+            start = end
+        return records
+
+
+@dataclass
+class PairCandidates:
+    """Qualifying (token row, buy source, sell source) pairs, best expected profit first"""
+    row: np.ndarray
+    buy_source: np.ndarray
+    sell_source: np.ndarray
+    spread_pct: np.ndarray       # gross, sell vs buy price
+    net_spread_pct: np.ndarray   # after both legs' fees
+    profit_per_token: np.ndarray # sell proceeds minus buy cost, after fees
+    trade_size: np.ndarray       # tokens, capped by the shallower leg's liquidity
+    profit: np.ndarray           # profit_per_token * trade_size
+
+
+def rank_pairs(price: np.ndarray, liquidity: np.ndarray, kept: np.ndarray, fee_rates: np.ndarray,
+               min_net_spread: float, max_spread: float, min_liquidity: float,
+               trade_fraction: float) -> PairCandidates:
+    """Evaluate every buy/sell source pair of every row at once (a rows x sources x sources cube).
+
+    Buying at source i costs price_i * (1 + fee_i), selling at j yields price_j * (1 - fee_j).
+    A pair qualifies when its net spread is at least `min_net_spread`, its gross spread at most
+    `max_spread` (fractions), and both legs have `min_liquidity`; the trade is capped at
+    `trade_fraction` of the shallower leg's liquidity. `fee_rates` is per row and source.
+    """
+    buy_cost = price * (1 + fee_rates)
+    sell_value = price * (1 - fee_rates)
+    sources = kept.shape[1]
+
+    pair = kept[:, :, None] & kept[:, None, :] & ~np.eye(sources, dtype=bool)
+    deep = liquidity >= min_liquidity
+    pair &= deep[:, :, None] & deep[:, None, :]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        net = sell_value[:, None, :] / buy_cost[:, :, None] - 1
+        gross = price[:, None, :] / price[:, :, None] - 1
+    pair &= (net >= min_net_spread) & (gross <= max_spread)
+
+    row, buy, sell = np.nonzero(pair)
+    trade_size = np.minimum(liquidity[row, buy], liquidity[row, sell]) * trade_fraction / price[row, buy]
+    profit_per_token = sell_value[row, sell] - buy_cost[row, buy]
+    profit = profit_per_token * trade_size
+
+    order = np.argsort(-profit, kind='stable')
+    return PairCandidates(
+        row=row[order], buy_source=buy[order], sell_source=sell[order],
+        spread_pct=gross[row, buy, sell][order] * 100, net_spread_pct=net[row, buy, sell][order] * 100,
+        profit_per_token=profit_per_token[order], trade_size=trade_size[order], profit=profit[order]
+    )
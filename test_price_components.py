@@ -0,0 +1,299 @@
+"""
+Regression tests for the tracker's building blocks
+Offline - no network access; run with pytest
+"""
+
+import asyncio
+import json
+import time
+from email.utils import format_datetime
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+import pytest
+
+from multi_dex_prices import (CircuitBreaker, PoolData, PoolTable, TokenBucket, iter_json_array,
+                              retry_after_seconds)
+from price_matrix import PriceMatrix, rank_pairs
+
+
+async def _chunked(body: bytes, size: int):
+    for start in range(0, len(body), size):
+        yield body[start:start + size]
+
+
+def parse_array(body: bytes, size: int, key=None) -> list:
+    async def collect():
+        return [value async for value in iter_json_array(_chunked(body, size), key)]
+    return asyncio.run(collect())
+
+
+# iter_json_array
+
+ELEMENTS = [
+    {"address": "pool,1", "price": 1.5, "tags": ["a]", "b"]},
+    1.5, -2e3, 10, 0.25, True, False, None,
+    "café \U0001F680",   # multi-byte UTF-8, split across chunks at small sizes
+    [1, [2, 3]],
+    123456789,
+]
+
+
+def test_iter_json_array_every_chunk_size():
+    body = json.dumps(ELEMENTS).encode()
+    for size in range(1, len(body) + 1):
+        assert parse_array(body, size) == ELEMENTS, size
+
+
+def test_iter_json_array_under_key_every_chunk_size():
+    body = json.dumps({"meta": {"whirlpools": 1}, "whirlpools": ELEMENTS, "tail": [0]}).encode()
+    for size in range(1, len(body) + 1):
+        assert parse_array(body, size, key="whirlpools") == ELEMENTS, size
+
+
+def test_iter_json_array_number_split_at_chunk_boundary():
+    # "1." then "5" must not decode as 1
+    assert parse_array(b'[1.5,22]', 2) == [1.5, 22]
+    assert parse_array(b'[12345]', 3) == [12345]
+
+
+def test_iter_json_array_empty_and_whitespace():
+    assert parse_array(b' [ ] ', 1) == []
+    assert parse_array(b'[ 1 ,\n 2 ]', 1) == [1, 2]
+
+
+def test_iter_json_array_truncated_body_raises():
+    with pytest.raises(ValueError):
+        parse_array(b'[1, 2, {"a": ', 4)
+    with pytest.raises(ValueError):
+        parse_array(b'[1, 2', 4)
+
+
+def test_iter_json_array_missing_key_raises():
+    with pytest.raises(ValueError):
+        parse_array(b'{"pairs": [1]}', 3, key="whirlpools")
+
+
+# retry_after_seconds / TokenBucket
+
+def test_retry_after_seconds():
+    assert retry_after_seconds("5") == 5.0
+    assert retry_after_seconds("-3") == 0.0
+    assert retry_after_seconds(None, default=2.0) == 2.0
+    assert retry_after_seconds("soon", default=2.0) == 2.0
+    future = format_datetime(datetime.now(timezone.utc) + timedelta(seconds=30), usegmt=True)
+    assert 25 <= retry_after_seconds(future) <= 30
+    past = format_datetime(datetime.now(timezone.utc) - timedelta(seconds=30), usegmt=True)
+    assert retry_after_seconds(past) == 0.0
+
+
+def test_token_bucket_burst_then_rate():
+    bucket = TokenBucket(rate=50.0, burst=3)
+
+    async def take(n):
+        for _ in range(n):
+            await bucket.acquire()
+
+    start = time.monotonic()
+    asyncio.run(take(3))
+    assert time.monotonic() - start < 0.05
+    start = time.monotonic()
+    asyncio.run(take(5))
+    assert time.monotonic() - start >= 5 / 50.0 * 0.8
+
+
+def test_token_bucket_pause_blocks_and_drains():
+    bucket = TokenBucket(rate=1000.0, burst=10)
+    bucket.pause(0.1)
+    assert 0.05 < bucket.blocked_for() <= 0.1
+    assert bucket.tokens == 0.0
+    start = time.monotonic()
+    asyncio.run(bucket.acquire())
+    assert time.monotonic() - start >= 0.09
+    assert bucket.blocked_for() == 0.0
+
+
+def test_token_bucket_update_from_headers():
+    bucket = TokenBucket(rate=10.0, burst=10)
+    bucket.update_from_headers({'X-RateLimit-Remaining': '3', 'X-RateLimit-Reset': '60'})
+    assert bucket.blocked_for() == 0.0
+    bucket.update_from_headers({'X-RateLimit-Remaining': '0', 'X-RateLimit-Reset': '2'})
+    assert 1.5 < bucket.blocked_for() <= 2.0
+    # An epoch reset time is turned into a delay
+    bucket = TokenBucket(rate=10.0, burst=10)
+    bucket.update_from_headers({'RateLimit-Remaining': '0', 'RateLimit-Reset': str(time.time() + 5)})
+    assert 4.0 < bucket.blocked_for() <= 5.0
+
+
+# CircuitBreaker
+
+def test_circuit_breaker_opens_after_threshold():
+    breaker = CircuitBreaker(failure_threshold=3, base_backoff=5, max_backoff=300)
+    for _ in range(2):
+        breaker.record_failure(RuntimeError("boom"))
+        assert breaker.state == CircuitBreaker.CLOSED and breaker.allow()
+    breaker.record_failure(RuntimeError("boom"))
+    assert breaker.state == CircuitBreaker.OPEN
+    assert not breaker.allow()
+    assert 4.9 < breaker.to_dict()['retry_in'] <= 5
+    assert breaker.to_dict()['last_error'] == "RuntimeError: boom"
+
+
+def test_circuit_breaker_half_open_probe():
+    breaker = CircuitBreaker(failure_threshold=1, base_backoff=5, max_backoff=8)
+    breaker.record_failure(RuntimeError())
+    breaker.retry_at = 0.0
+    assert breaker.allow() and breaker.state == CircuitBreaker.HALF_OPEN
+    assert not breaker.allow()   # a single probe at a time
+
+    # A failed probe reopens with the backoff doubled, capped at max_backoff
+    breaker.record_failure(RuntimeError())
+    assert breaker.state == CircuitBreaker.OPEN
+    assert 7.9 < breaker.retry_at - time.monotonic() <= 8
+
+    breaker.retry_at = 0.0
+    assert breaker.allow()
+    breaker.record_success()
+    assert breaker.state == CircuitBreaker.CLOSED and breaker.failures == 0 and breaker.trips == 0
+
+
+def test_circuit_breaker_rate_limited_is_not_a_failure():
+    breaker = CircuitBreaker(failure_threshold=1)
+    breaker.record_rate_limited(30)
+    assert breaker.state == CircuitBreaker.CLOSED and breaker.failures == 0
+
+    breaker.record_failure(RuntimeError())
+    breaker.retry_at = 0.0
+    assert breaker.allow()
+    breaker.record_rate_limited(30)
+    assert breaker.state == CircuitBreaker.OPEN and breaker.trips == 1
+    assert 29 < breaker.retry_at - time.monotonic() <= 30
+
+
+# PoolTable
+
+def pool(address: str, price: float = 1.0, dex: str = 'Orca') -> PoolData:
+    return PoolData(dex, 'SOL', 'USDC', price, 1e5, 1e3, 0.003, address)
+
+
+def test_pool_table_evicts_after_missed_cycles():
+    table = PoolTable(max_missed_cycles=2)
+    for address in 'ABC':
+        table.stage(pool(address))
+    table.commit('Orca')
+    for _ in range(2):
+        table.stage(pool('A'))
+        table.commit('Orca')
+    assert [p.pool_address for p in table] == ['A']
+    assert table.get('B') is None
+
+
+def test_pool_table_eviction_is_per_dex_and_failed_fetches_do_not_count():
+    table = PoolTable(max_missed_cycles=1)
+    table.stage(pool('A', dex='Orca'))
+    table.stage(pool('M', dex='Meteora'))
+    table.commit('Orca')
+    table.commit('Meteora')
+    table.stage(pool('A', dex='Orca'))
+    table.discard('Orca')     # a failed fetch: nothing applied, no cycle closed
+    table.commit('Meteora')   # Meteora's cycle passes without 'M'
+    assert table.get('A') is not None
+    assert table.get('M') is None
+
+
+def test_pool_table_ids_are_stable_and_freed():
+    table = PoolTable(max_missed_cycles=1)
+    for cycle in range(50):
+        for i in range(100):
+            table.upsert(pool(f"c{cycle}p{i}"))
+        ids = dict(zip((p.pool_address for p in table), table.column('pool').tolist()))
+        table.end_cycle('Orca')
+        # Survivors keep their ids after rows move
+        assert all(ids[p.pool_address] == pool_id for p, pool_id in zip(table, table.column('pool').tolist()))
+    snapshot = table.snapshot(1)
+    assert len(table) == len(snapshot.addresses) == 100
+    assert table.column('pool').max() < 200
+    assert snapshot.get('c49p7').pool_address == 'c49p7'
+    assert snapshot.get('c0p7') is None
+
+
+def test_pool_table_version_changes_only_on_real_changes():
+    table = PoolTable(max_missed_cycles=1)
+    table.upsert(pool('A'))
+    version = table.version
+    table.upsert(pool('A'))
+    assert table.version == version
+    table.upsert(pool('A', price=2.0))
+    assert table.version > version
+    version = table.version
+    table.end_cycle('Orca')
+    table.end_cycle('Orca')
+    assert len(table) == 0 and table.version > version
+
+
+# PriceMatrix.load_source dirty tracking
+
+def test_load_source_reports_changed_tokens():
+    matrix = PriceMatrix(4, 2)
+    quotes = {0: (1.0, 10.0, 1.0), 1: (2.0, 20.0, 2.0), 2: (3.0, 30.0, 3.0)}
+    assert sorted(matrix.load_source(0, quotes).tolist()) == [0, 1, 2]
+    assert matrix.load_source(0, dict(quotes)).tolist() == []
+
+    changed = {**quotes, 1: (2.0, 25.0, 2.0)}             # liquidity only
+    assert matrix.load_source(0, changed).tolist() == [1]
+
+    removed = {0: quotes[0], 1: changed[1], 3: (4.0, 40.0, 4.0)}
+    assert sorted(matrix.load_source(0, removed).tolist()) == [2, 3]
+    assert matrix.mask[:, 0].tolist()[:4] == [True, True, False, True]
+
+    # Other sources are untouched
+    assert matrix.load_source(1, {2: (3.0, 30.0, 3.0)}).tolist() == [2]
+    assert sorted(matrix.clear_source(0).tolist()) == [0, 1, 3]
+    assert matrix.mask[:4].tolist() == [[False, False], [False, False], [False, True], [False, False]]
+
+
+def test_load_source_grows_for_new_tokens_and_sources():
+    matrix = PriceMatrix()
+    assert matrix.load_source(2, {40: (1.0, 1.0, 1.0)}).tolist() == [40]
+    assert matrix.mask.shape[0] > 40 and matrix.mask.shape[1] == 3
+    assert matrix.price[40, 2] == 1.0
+
+
+# rank_pairs
+
+def test_rank_pairs_filters_and_orders_by_profit():
+    price = np.array([[100.0, 101.0, 102.0],
+                      [10.0, 10.5, 10.0]])
+    liquidity = np.array([[1e6, 1e6, 1e3],
+                          [1e6, 2e6, 1e6]])
+    kept = np.ones((2, 3), dtype=bool)
+    fees = np.zeros((2, 3))
+
+    pairs = rank_pairs(price, liquidity, kept, fees, min_net_spread=0.005, max_spread=0.06,
+                       min_liquidity=1e4, trade_fraction=0.05)
+    found = list(zip(pairs.row.tolist(), pairs.buy_source.tolist(), pairs.sell_source.tolist()))
+    # Row 0: source 2 is too shallow, so only 0 -> 1 (1%); row 1: 0 -> 1 and 2 -> 1 (5%)
+    assert sorted(found) == [(0, 0, 1), (1, 0, 1), (1, 2, 1)]
+    assert (np.diff(pairs.profit) <= 0).all()
+    assert np.allclose(pairs.profit, pairs.profit_per_token * pairs.trade_size)
+    row0 = found.index((0, 0, 1))
+    assert pairs.trade_size[row0] == pytest.approx(1e6 * 0.05 / 100.0)
+    assert pairs.spread_pct[row0] == pytest.approx(1.0)
+
+
+def test_rank_pairs_fees_and_spread_cap():
+    price = np.array([[100.0, 101.0, 120.0]])
+    liquidity = np.full((1, 3), 1e6)
+    kept = np.array([[True, True, True]])
+    fees = np.array([[0.003, 0.003, 0.003]])
+
+    pairs = rank_pairs(price, liquidity, kept, fees, min_net_spread=0.005, max_spread=0.05,
+                       min_liquidity=1e4, trade_fraction=0.05)
+    # 0 -> 1 is 1% gross but ~0.4% after two 0.3% fees; anything into source 2 exceeds the 5% cap
+    assert len(pairs.row) == 0
+
+    kept[0, 2] = False
+    pairs = rank_pairs(price, liquidity, kept, fees * 0, min_net_spread=0.005, max_spread=0.5,
+                       min_liquidity=1e4, trade_fraction=0.05)
+    assert list(zip(pairs.buy_source.tolist(), pairs.sell_source.tolist())) == [(0, 1)]
+    assert pairs.net_spread_pct[0] == pytest.approx(1.0)